@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+协议编解码和音频工具的微基准测试
+- 每个用例报告 ops/s 和每次调用的峰值临时内存分配
+- 结果可保存为基线（bench_baseline.json），之后的运行会与基线对比并标出变慢的用例
+- --policies 额外对比各压缩策略每秒音频消耗的 CPU 时间和压缩率
+不需要网络和密钥
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import platform
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Callable, Dict, List, Tuple
+
+from sauc_mock_server import MockAsrSession, MockServerConfig, build_server_frame
+from sauc_websocket_demo import (
+    AsrRequestHeader,
+    AsrWsClient,
+    AudioFrameEncoder,
+    CommonUtils,
+    MessageType,
+    MessageTypeSpecificFlags,
+    PayloadCompressor,
+    RequestBuilder,
+    ResponseParser,
+)
+
+try:
+    from sauc_audio import PcmNormalizer
+except ImportError:  # 未安装 NumPy 时跳过格式转换用例
+    PcmNormalizer = None
+
+SAMPLE_RATE = 16000
+SEGMENT_DURATION = 200  # ms
+MIN_BENCH_SECONDS = 0.2  # 每个用例至少运行的时长
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+def make_pcm_segment(duration_ms=SEGMENT_DURATION, sample_rate=SAMPLE_RATE):
+    """生成一段 16bit 单声道正弦波 PCM，模拟 200ms 音频包"""
+    n = sample_rate * duration_ms // 1000
+    samples = array('h', (int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(n)))
+    return samples.tobytes()
+
+
+def make_speech_like_pcm(seconds, sample_rate=SAMPLE_RATE):
+    """生成带包络和噪声的 PCM，压缩率接近真实通话录音（纯正弦波会被压得过小）"""
+    rng = random.Random(0)
+    n = sample_rate * seconds
+    samples = array('h')
+    for i in range(n):
+        t = i / sample_rate
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)
+        voice = math.sin(2 * math.pi * 180 * t) + 0.5 * math.sin(2 * math.pi * 720 * t)
+        samples.append(int(max(-32768, min(32767, 6000 * envelope * voice + rng.gauss(0, 300)))))
+    return samples.tobytes()
+
+
+def make_wav(pcm, sample_rate=SAMPLE_RATE):
+    """给 PCM 加上 44 字节的 WAV 头"""
+    return (b'RIFF' + struct.pack('<I', 36 + len(pcm)) + b'WAVE'
+            + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b'data' + struct.pack('<I', len(pcm)) + pcm)
+
+
+def make_result_frame(audio_seconds):
+    """生成一条服务端累积结果帧，audio_seconds 越长 payload 越大"""
+    session = MockAsrSession(MockServerConfig(), stream_partials=True)
+    session.audio_bytes = audio_seconds * SAMPLE_RATE * 2
+    return build_server_frame(1, session.result())
+
+
+def legacy_frame(seq, payload):
+    """原 new_audio_only_request 的组包方式（不含压缩），作为对照"""
+    header = AsrRequestHeader.default_header() \
+        .with_message_type_specific_flags(MessageTypeSpecificFlags.POS_SEQUENCE) \
+        .with_message_type(MessageType.CLIENT_AUDIO_ONLY_REQUEST)
+    request = bytearray()
+    request.extend(header.to_bytes())
+    request.extend(struct.pack('>i', seq))
+    request.extend(struct.pack('>I', len(payload)))
+    request.extend(payload)
+    return bytes(request)
+
+
+def measure_ops(func, min_seconds=MIN_BENCH_SECONDS):
+    """返回每秒调用次数，迭代次数自动放大到运行时长超过 min_seconds"""
+    func()  # 预热
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return iterations / elapsed
+        iterations *= 2 if elapsed <= 0 else max(2, int(min_seconds / elapsed * 1.2))
+
+
+def measure_alloc(func, iterations=50):
+    """返回每次调用的峰值临时内存分配（字节）"""
+    func()  # 预热，避免把一次性的缓冲区扩容算进去
+    tracemalloc.start()
+    total = 0
+    try:
+        for _ in range(iterations):
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - base
+    finally:
+        tracemalloc.stop()
+    return total / iterations
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    segment = make_pcm_segment()
+    payload = gzip.compress(segment)
+    encoder = AudioFrameEncoder()
+    flags = MessageTypeSpecificFlags.POS_SEQUENCE
+    header = AsrRequestHeader.default_header()
+    small_frame = make_result_frame(5)
+    large_frame = make_result_frame(1800)
+    wav = make_wav(make_speech_like_pcm(60))
+    segment_size = SAMPLE_RATE * 2 * SEGMENT_DURATION // 1000
+
+    cases = [
+        ("AsrRequestHeader.to_bytes", header.to_bytes),
+        ("RequestBuilder.new_full_client_request", lambda: RequestBuilder.new_full_client_request(1)),
+        ("RequestBuilder.new_audio_only_request", lambda: RequestBuilder.new_audio_only_request(2, segment)),
+        ("AudioFrameEncoder.encode", lambda: encoder.encode(2, segment)),
+        ("frame.legacy_bytearray (no gzip)", lambda: legacy_frame(2, payload)),
+        ("AudioFrameEncoder.pack (no gzip)", lambda: encoder.pack(2, flags, payload)),
+        ("parse_response small", lambda: ResponseParser.parse_response(small_frame)),
+        ("parse_response+decode small", lambda: ResponseParser.parse_response(small_frame).payload_msg),
+        ("parse_response large", lambda: ResponseParser.parse_response(large_frame)),
+        ("parse_response+decode large", lambda: ResponseParser.parse_response(large_frame).payload_msg),
+        ("CommonUtils.read_wav_info (60s)", lambda: CommonUtils.read_wav_info(wav)),
+        ("AsrWsClient.split_audio (60s)", lambda: AsrWsClient.split_audio(wav, segment_size)),
+    ]
+    if PcmNormalizer is not None:
+        # 200ms 的 44.1kHz 双声道输入，转为 16kHz 单声道
+        stereo = make_speech_like_pcm(1, 44100)[:44100 * 2 * SEGMENT_DURATION // 1000] * 2
+        normalizer = PcmNormalizer(44100, channels=2)
+        cases.append(("PcmNormalizer.convert 44.1k stereo", lambda: normalizer.convert(stereo)))
+        # 200ms 的 8kHz μ-law 电话音频，解码并上采样到 16kHz
+        mulaw = bytes(range(256)) * 7
+        telephony = PcmNormalizer.from_codec("mulaw", 8000, bits=8)
+        cases.append(("PcmNormalizer.convert mu-law 8k", lambda: telephony.convert(mulaw[:1600])))
+    return cases
+
+
+def run_suite(filter_text=None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    print("=" * 86)
+    print(f"{'用例':<48} {'ops/s':>14} {'bytes/op':>12}")
+    print("=" * 86)
+    for name, func in build_cases():
+        if filter_text and filter_text not in name:
+            continue
+        ops = measure_ops(func)
+        alloc = measure_alloc(func)
+        results[name] = {"ops_per_sec": ops, "bytes_per_op": alloc}
+        print(f"{name:<48} {ops:14,.0f} {alloc:12,.0f}")
+    return results
+
+
+def compare(results, baseline, tolerance) -> List[str]:
+    """与基线对比，返回退化的用例名"""
+    regressions = []
+    print("\n" + "=" * 86)
+    print(f"与基线对比 (基线: Python {baseline.get('python')} / {baseline.get('machine')}, 容差 {tolerance:.0%})")
+    print("=" * 86)
+    for name, current in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:<48} (基线中无此用例)")
+            continue
+        speed = current["ops_per_sec"] / base["ops_per_sec"]
+        alloc_delta = current["bytes_per_op"] - base["bytes_per_op"]
+        slower = speed < 1 - tolerance
+        heavier = alloc_delta > max(base["bytes_per_op"] * tolerance, 256)
+        mark = "  <-- 变慢" if slower else ""
+        mark += "  <-- 内存增加" if heavier else ""
+        if slower or heavier:
+            regressions.append(name)
+        print(f"{name:<48} {speed:8.2f}x 速度 {alloc_delta:+12,.0f} bytes{mark}")
+    return regressions
+
+
+def bench_compression_policy(seconds=10):
+    pcm = make_speech_like_pcm(seconds)
+    segment_size = SAMPLE_RATE * 2 * SEGMENT_DURATION // 1000
+    segments = [pcm[i:i + segment_size] for i in range(0, len(pcm), segment_size)]
+    policies = ["none", "gzip:1", "gzip:3", "gzip:6", "gzip:9", f"gzip:1:{segment_size}"]
+
+    print("\n" + "=" * 70)
+    print(f"压缩策略 ({seconds}s 音频, {len(segments)} 包)")
+    print("=" * 70)
+    for spec in policies:
+        compressor = PayloadCompressor.from_spec(spec)
+        rounds = 5
+        wire_bytes = 0
+        start = time.process_time()
+        for _ in range(rounds):
+            wire_bytes = 0
+            for segment in segments:
+                _, payload = compressor.compress(segment)
+                wire_bytes += len(payload)
+        cpu_ms = (time.process_time() - start) / rounds / seconds * 1000
+        ratio = wire_bytes / len(pcm)
+        print(f"  {spec:<14} {cpu_ms:8.3f} ms CPU/音频秒  压缩后 {ratio * 100:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codec and audio utility micro-benchmarks")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Save this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging, default:0.2")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any case regressed")
+    parser.add_argument("--filter", type=str, default=None, help="Only run cases whose name contains this text")
+    parser.add_argument("--policies", action="store_true", help="Also report CPU cost of each compression policy")
+    args = parser.parse_args()
+
+    results = run_suite(args.filter)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results
+            }, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\n基线已保存到 {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.policies:
+        bench_compression_policy()
+
+    if args.check and regressions:
+        print(f"\n❌ {len(regressions)} 个用例退化")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+    # 用法：
+    # python3 bench_codec.py --save-baseline   # 在基准版本上保存基线
+    # python3 bench_codec.py --check           # 之后的版本与基线对比
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+事件循环延迟测试：大 payload 的解压和 JSON 解析是否放到线程池
+本地模拟服务运行在独立进程中，每个字对应的音频很短，长通话后期的累积结果很大；
+同一事件循环上跑大量并发会话，并用一个定时任务测量事件循环被阻塞的时长
+不需要网络和密钥
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from bench_codec import make_speech_like_pcm, make_wav
+from bench_shm import percentile
+from bench_workers import free_port, wait_for_port
+from sauc_pool import AsrSessionPool
+from sauc_websocket_demo import BytesAudioSource, CodecOffload, PacingPolicy, logger
+
+LAG_PROBE_INTERVAL = 0.01
+
+
+async def probe_lag(samples, stop):
+    """每隔 LAG_PROBE_INTERVAL 秒醒来一次，记录实际醒来时间比预期晚了多少"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_PROBE_INTERVAL
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        samples.append(loop.time() - expected)
+
+
+async def run_once(url, wav, sessions, pacing, offload):
+    samples = []
+    stop = asyncio.Event()
+    async with AsrSessionPool(url, max_sessions=sessions, pacing=pacing, offload=offload) as pool:
+        async def call(index):
+            async with pool.session(f"call-{index}") as client:
+                async for response in client.execute(BytesAudioSource(wav)):
+                    response.payload_msg  # 与实际使用一致：每条结果都会被读取
+
+        prober = asyncio.create_task(probe_lag(samples, stop))
+        start = time.monotonic()
+        await asyncio.gather(*(call(i) for i in range(sessions)))
+        elapsed = time.monotonic() - start
+        stop.set()
+        await prober
+    return elapsed, samples
+
+
+async def run(sessions, seconds, speed, ms_per_char, offload_spec):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sauc_mock_server.py"),
+         "--port", str(port), "--ms-per-char", str(ms_per_char)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        await wait_for_port(port)
+        url = f"ws://127.0.0.1:{port}/api/v3/sauc/bigmodel"
+        wav = make_wav(make_speech_like_pcm(seconds))
+        pacing = PacingPolicy(speed)
+        print("=" * 70)
+        print(f"事件循环延迟 ({sessions} 个并发会话, 每个 {seconds}s 音频, {speed:g} 倍速, "
+              f"最终结果约 {seconds * 1000 // ms_per_char} 字)")
+        print("=" * 70)
+        for label, offload in (("事件循环内解码", None), (f"线程池 {offload_spec}", CodecOffload.from_spec(offload_spec))):
+            elapsed, samples = await run_once(url, wav, sessions, pacing, offload)
+            offloaded = offload.offloaded if offload is not None else 0
+            if offload is not None:
+                offload.shutdown()
+            print(f"  {label:<28} 耗时 {elapsed:6.2f} s  延迟 p50 {percentile(samples, 0.5) * 1000:6.2f} ms  "
+                  f"p99 {percentile(samples, 0.99) * 1000:7.2f} ms  最大 {max(samples) * 1000:7.2f} ms  "
+                  f"线程池任务 {offloaded}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop lag with and without codec offload")
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent sessions, default:200")
+    parser.add_argument("--seconds", type=int, default=60, help="Audio length per session, default:60")
+    parser.add_argument("--speed", type=float, default=4.0, help="Send speed relative to realtime, default:4")
+    parser.add_argument("--ms-per-char", type=int, default=20,
+                        help="Mock server audio ms per character, default:20")
+    parser.add_argument("--offload", type=str, default="thread", help="Offload spec, default:thread")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    asyncio.run(run(args.sessions, args.seconds, args.speed, args.ms_per_char, args.offload))
+
+
+if __name__ == "__main__":
+    main()
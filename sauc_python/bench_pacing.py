@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+发送节拍负载测试：每个会话各自 asyncio.sleep vs 共用 TickScheduler
+- 纯调度：只运行发送循环（不联网），单独比较两种等待方式本身的开销和抖动
+- 完整会话：本地模拟服务运行在独立进程中，大量会话按实时节奏发送
+会话启动时间在一个分段内随机错开。统计本进程的 CPU 时间和相邻两包发送间隔相对分段时长的偏差（抖动）
+不需要网络和密钥
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from bench_codec import make_speech_like_pcm, make_wav
+from bench_shm import percentile
+from bench_workers import free_port, wait_for_port
+from sauc_scheduler import TickScheduler
+from sauc_websocket_demo import AsrWsClient, BytesAudioSource, logger
+
+
+def gap_deviations(sent_at, interval):
+    # 第一包紧跟握手发出，第一次等待要对齐到节拍边界，从第二个间隔开始统计
+    return [abs(later - earlier - interval) for earlier, later in zip(sent_at[1:], sent_at[2:])]
+
+
+async def paced_loop(segment_duration, packets, scheduler, sent_at):
+    """与 send_messages 相同的截止时间排程，只记录时刻，不发送"""
+    await asyncio.sleep(random.random() * segment_duration / 1000)
+    loop = asyncio.get_running_loop()
+    interval = segment_duration / 1000
+    deadline = loop.time()
+    for _ in range(packets):
+        sent_at.append(loop.time())
+        deadline += interval
+        if scheduler is not None:
+            await scheduler.sleep_until(deadline)
+        else:
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+
+
+async def run_paced_only(sessions, seconds, segment_duration, scheduler):
+    timelines = [[] for _ in range(sessions)]
+    packets = seconds * 1000 // segment_duration
+    cpu = time.process_time()
+    await asyncio.gather(*(paced_loop(segment_duration, packets, scheduler, sent_at) for sent_at in timelines))
+    cpu = time.process_time() - cpu
+    deviations = [d for sent_at in timelines for d in gap_deviations(sent_at, segment_duration / 1000)]
+    return cpu, deviations
+
+
+class TimedClient(AsrWsClient):
+    """记录每个音频包的发送时刻"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent_at = []
+
+    async def _send_audio(self, packet, is_last):
+        self.sent_at.append(asyncio.get_running_loop().time())
+        await super()._send_audio(packet, is_last)
+
+
+async def run_once(url, wav, sessions, segment_duration, scheduler):
+    clients = []
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as http:
+        async def call():
+            # 通话开始时间在一个分段内随机错开
+            await asyncio.sleep(random.random() * segment_duration / 1000)
+            client = TimedClient(url, segment_duration, session=http, scheduler=scheduler)
+            clients.append(client)
+            async for _ in client.execute(BytesAudioSource(wav), finals_only=True):
+                pass
+
+        cpu = time.process_time()
+        start = time.monotonic()
+        results = await asyncio.gather(*(call() for _ in range(sessions)), return_exceptions=True)
+        elapsed = time.monotonic() - start
+        cpu = time.process_time() - cpu
+
+    failed = sum(isinstance(result, Exception) for result in results)
+    deviations = [d for client in clients for d in gap_deviations(client.sent_at, segment_duration / 1000)]
+    packets = sum(len(client.sent_at) for client in clients)
+    return elapsed, cpu, deviations, packets, failed
+
+
+def report(label, cpu, packets, deviations, extra=""):
+    print(f"  {label:<20} CPU {cpu:6.2f} s  每包 {cpu / max(packets, 1) * 1e6:6.1f} us  "
+          f"间隔偏差 p50 {percentile(deviations, 0.5) * 1000:6.2f} ms  p99 {percentile(deviations, 0.99) * 1000:7.2f} ms"
+          + extra)
+
+
+async def run(sessions, seconds, segment_duration, tick_ms):
+    print("=" * 70)
+    print(f"纯调度 ({sessions} 个会话, 每个 {seconds}s, 分段 {segment_duration}ms, 节拍 {tick_ms}ms)")
+    print("=" * 70)
+    packets = sessions * (seconds * 1000 // segment_duration)
+    for label, scheduler in (("各自 asyncio.sleep", None), ("共用 TickScheduler", TickScheduler(tick_ms))):
+        cpu, deviations = await run_paced_only(sessions, seconds, segment_duration, scheduler)
+        report(label, cpu, packets, deviations)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sauc_mock_server.py"),
+         "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        await wait_for_port(port)
+        url = f"ws://127.0.0.1:{port}/api/v3/sauc/bigmodel"
+        wav = make_wav(make_speech_like_pcm(seconds))
+        print("=" * 70)
+        print(f"完整会话 ({sessions} 个会话, 每个 {seconds}s 音频, 实时发送, 分段 {segment_duration}ms, 节拍 {tick_ms}ms)")
+        print("=" * 70)
+        for label, scheduler in (("各自 asyncio.sleep", None), ("共用 TickScheduler", TickScheduler(tick_ms))):
+            elapsed, cpu, deviations, packets, failed = await run_once(url, wav, sessions, segment_duration, scheduler)
+            report(label, cpu, packets, deviations, f"  耗时 {elapsed:.2f} s" + (f"  失败 {failed}" if failed else ""))
+            if scheduler is not None:
+                print(f"  {'':<20} {scheduler.snapshot()}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-session sleeps vs a shared tick scheduler")
+    parser.add_argument("--sessions", type=int, default=1000, help="Concurrent sessions, default:1000")
+    parser.add_argument("--seconds", type=int, default=10, help="Audio length per session, default:10")
+    parser.add_argument("--seg-duration", type=int, default=200, help="Audio duration(ms) per packet, default:200")
+    parser.add_argument("--tick", type=int, default=20, help="Scheduler tick (ms), default:20")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    asyncio.run(run(args.sessions, args.seconds, args.seg_duration, args.tick))
+
+
+if __name__ == "__main__":
+    main()
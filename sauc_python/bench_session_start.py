@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+会话启动延迟测试
+对本地模拟服务注入往返延迟，对比普通模式与流水线模式（--pipelined）从调用 execute 到收到首个中间结果的耗时
+不需要网络和密钥
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from bench_codec import make_speech_like_pcm, make_wav
+from sauc_mock_server import MockAsrServer, MockServerConfig
+from sauc_websocket_demo import AsrWsClient, BytesAudioSource, logger
+
+
+async def time_to_first_partial(url, wav, pipelined):
+    async with AsrWsClient(url, pipelined=pipelined) as client:
+        start = time.monotonic()
+        first_partial = None
+        async for response in client.execute(BytesAudioSource(wav)):
+            if first_partial is None and not response.is_last_package:
+                first_partial = time.monotonic() - start
+                break
+        return first_partial
+
+
+async def run(rtt_ms, sessions, seconds):
+    wav = make_wav(make_speech_like_pcm(seconds))
+    config = MockServerConfig(latency_ms=rtt_ms)
+    async with MockAsrServer(config) as server:
+        print("=" * 70)
+        print(f"首个中间结果耗时 (注入往返延迟 {rtt_ms:g} ms, {sessions} 次)")
+        print("=" * 70)
+        for pipelined in (False, True):
+            samples = [await time_to_first_partial(server.url, wav, pipelined) for _ in range(sessions)]
+            name = "流水线模式" if pipelined else "普通模式"
+            print(f"  {name:<10} 平均 {statistics.mean(samples) * 1000:7.1f} ms  "
+                  f"中位数 {statistics.median(samples) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare time-to-first-partial with and without pipelining")
+    parser.add_argument("--rtt", type=float, default=50.0, help="Injected round trip latency (ms), default:50")
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions per mode, default:10")
+    parser.add_argument("--seconds", type=int, default=2, help="Audio length per session, default:2")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    asyncio.run(run(args.rtt, args.sessions, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
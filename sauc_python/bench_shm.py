@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+跨进程音频交接测试：共享内存环形缓冲区 vs multiprocessing.Queue
+- 吞吐：写入方不限速写入，统计读取进程每秒收到的块数
+- 延迟：按固定间隔写入，每块前 8 字节记录写入时刻，读取进程收到时计算耗时
+读取进程的等待方式与 sauc_workers 的工作进程一致：队列在线程中阻塞读取，环形缓冲区轮询
+不需要网络和密钥
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import struct
+import time
+from typing import List
+
+from sauc_shm import DEFAULT_RING_SLOTS, POLL_INTERVAL, SharedAudioRing
+
+STAMP = struct.Struct('<d')
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] if ordered else 0.0
+
+
+async def _consume_queue(queue: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    latencies = []
+    while True:
+        chunk = await loop.run_in_executor(None, queue.get)
+        if chunk is None:
+            break
+        latencies.append(time.perf_counter() - STAMP.unpack_from(chunk)[0])
+    results.put((time.perf_counter(), latencies))
+
+
+async def _consume_ring(name: str, lock, results: multiprocessing.Queue) -> None:
+    ring = SharedAudioRing.attach(name, lock)
+    latencies = []
+    chunks = ring.chunks()
+    async for chunk in chunks:
+        latencies.append(time.perf_counter() - STAMP.unpack_from(chunk)[0])
+    ring.close()
+    results.put((time.perf_counter(), latencies))
+
+
+def consumer_main(mode: str, source, lock, results: multiprocessing.Queue) -> None:
+    if mode == "queue":
+        asyncio.run(_consume_queue(source, results))
+    else:
+        asyncio.run(_consume_ring(source, lock, results))
+
+
+async def produce(mode: str, sink, chunk_size: int, count: int, interval: float) -> float:
+    """写入 count 块，返回第一块的写入时刻"""
+    payload = bytearray(chunk_size)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    deadline = loop.time()
+    for _ in range(count):
+        STAMP.pack_into(payload, 0, time.perf_counter())
+        if mode == "queue":
+            sink.put(bytes(payload))
+        else:
+            await sink.awrite(payload)
+        if interval:
+            deadline += interval
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+    if mode == "queue":
+        sink.put(None)
+    else:
+        sink.close_writer()
+    return start
+
+
+def run_case(mode: str, chunk_size: int, count: int, interval: float, slots: int, poll_interval: float):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    lock = None
+    if mode == "queue":
+        sink = context.Queue()
+        source = sink
+    else:
+        # 槽位大小取块大小，与工作进程中按分段读取的情形一致
+        lock = context.Lock()
+        sink = SharedAudioRing.create(chunk_size, slots, lock, poll_interval)
+        source = sink.name
+    process = context.Process(target=consumer_main, args=(mode, source, lock, results), daemon=True)
+    process.start()
+    try:
+        start = asyncio.run(produce(mode, sink, chunk_size, count, interval))
+        end, latencies = results.get()
+    finally:
+        process.join()
+        if mode != "queue":
+            sink.close()
+    return count / (end - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory ring vs queue handoff between processes")
+    parser.add_argument("--chunk-size", type=int, default=6400, help="Bytes per chunk, default:6400 (200ms 16k PCM)")
+    parser.add_argument("--chunks", type=int, default=20000, help="Chunks for the throughput run, default:20000")
+    parser.add_argument("--latency-chunks", type=int, default=500, help="Chunks for the latency run, default:500")
+    parser.add_argument("--interval", type=float, default=10.0, help="Write interval in the latency run (ms), default:10")
+    parser.add_argument("--slots", type=int, default=DEFAULT_RING_SLOTS, help="Ring slots, default:64")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL * 1000,
+                        help="Ring reader poll interval (ms), default:5")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"跨进程音频交接 (块大小 {args.chunk_size} 字节)")
+    print("=" * 70)
+    for mode, label in (("queue", "multiprocessing.Queue"), ("ring", "SharedAudioRing")):
+        throughput, _ = run_case(mode, args.chunk_size, args.chunks, 0.0, args.slots, args.poll_interval / 1000)
+        _, latencies = run_case(mode, args.chunk_size, args.latency_chunks, args.interval / 1000, args.slots,
+                                args.poll_interval / 1000)
+        print(f"  {label:<24} 吞吐 {throughput:>10,.0f} 块/s  "
+              f"延迟 p50 {percentile(latencies, 0.5) * 1000:6.3f} ms  p99 {percentile(latencies, 0.99) * 1000:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+多进程工作池吞吐测试
+本地模拟服务运行在独立进程中，对比不同工作进程数下每秒处理的音频时长（不按实时节奏发送）
+工作进程数超过 CPU 核数后吞吐不会再增加；模拟服务本身也占用一个核
+不需要网络和密钥
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_codec import make_speech_like_pcm, make_wav
+from sauc_websocket_demo import PacingPolicy, logger
+from sauc_workers import ShardedAsrSupervisor
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Mock server did not start on port {port}")
+
+
+async def run_once(url, workers, wav_path, calls, audio_seconds):
+    async with ShardedAsrSupervisor(url, workers, pacing=PacingPolicy.from_spec(PacingPolicy.MAX),
+                                    max_sessions=calls) as supervisor:
+        async def call(index):
+            async for _ in supervisor.transcribe(f"call-{index}", wav_path, finals_only=True):
+                pass
+
+        start = time.monotonic()
+        await asyncio.gather(*(call(i) for i in range(calls)))
+        elapsed = time.monotonic() - start
+    speed = calls * audio_seconds / elapsed
+    print(f"  {workers:>3} 个工作进程  {calls} 通  耗时 {elapsed:6.2f} s  {speed:8.1f} 音频秒/秒")
+
+
+async def run(worker_counts, calls, audio_seconds):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sauc_mock_server.py"),
+         "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        await wait_for_port(port)
+        url = f"ws://127.0.0.1:{port}/api/v3/sauc/bigmodel"
+        with tempfile.NamedTemporaryFile(suffix=".wav") as wav:
+            wav.write(make_wav(make_speech_like_pcm(audio_seconds)))
+            wav.flush()
+            print("=" * 70)
+            print(f"多进程吞吐 (CPU 核数 {os.cpu_count()}, 每通 {audio_seconds}s 音频)")
+            print("=" * 70)
+            for workers in worker_counts:
+                await run_once(url, workers, wav.name, calls, audio_seconds)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the multi-process ASR worker pool")
+    parser.add_argument("--workers", type=str, default="1,2,4", help="Comma separated worker counts, default:1,2,4")
+    parser.add_argument("--calls", type=int, default=32, help="Concurrent calls per run, default:32")
+    parser.add_argument("--seconds", type=int, default=10, help="Audio length per call, default:10")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    asyncio.run(run([int(n) for n in args.workers.split(",")], args.calls, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
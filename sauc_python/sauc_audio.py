@@ -0,0 +1,243 @@
+"""
+进程内 PCM 格式转换（依赖 NumPy）
+- 解析 WAV 头中的编码、声道、位深、采样率和数据起始位置
+- 8/16/24/32 位整数、32/64 位浮点 PCM 或 G.711 μ-law/A-law 转为 16bit，多声道取平均混为单声道
+- 多相 FIR 重采样到目标采样率
+以上步骤均可按块流式处理，块与块之间保留滤波器历史，结果与整体转换一致
+"""
+
+import math
+import struct
+from typing import AsyncGenerator, AsyncIterable, Tuple
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_ALAW = 0x0006
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+RESAMPLE_HALF_WIDTH = 10  # 滤波器半长（以较高采样率的周期数计），与 scipy.signal.resample_poly 一致
+RESAMPLE_KAISER_BETA = 5.0
+
+# AudioFormat.codec 对应的 WAV 编码
+CODEC_FORMAT_TAGS = {
+    "raw": WAVE_FORMAT_PCM,
+    "alaw": WAVE_FORMAT_ALAW,
+    "mulaw": WAVE_FORMAT_MULAW,
+}
+
+
+def _mulaw_table() -> np.ndarray:
+    """ITU-T G.711 μ-law 256 个码字对应的 16bit 样本值"""
+    code = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (code >> 4) & 0x07
+    magnitude = ((((code & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    return np.where(code & 0x80, -magnitude, magnitude).astype(np.float32)
+
+
+def _alaw_table() -> np.ndarray:
+    """ITU-T G.711 A-law 256 个码字对应的 16bit 样本值"""
+    code = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (code >> 4) & 0x07
+    mantissa = (code & 0x0F) << 4
+    magnitude = np.where(exponent == 0, mantissa + 8, (mantissa + 0x108) << np.maximum(exponent - 1, 0))
+    return np.where(code & 0x80, magnitude, -magnitude).astype(np.float32)
+
+
+G711_TABLES = {
+    WAVE_FORMAT_MULAW: _mulaw_table(),
+    WAVE_FORMAT_ALAW: _alaw_table(),
+}
+
+
+def read_wav_format(data: bytes) -> Tuple[int, int, int, int, int, int]:
+    """返回 (编码, 声道数, 每个采样的字节数, 采样率, data子块起始位置, data子块大小)
+
+    WAVE_FORMAT_EXTENSIBLE 会解析为其子格式
+    """
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError("Invalid WAV file: not RIFF/WAVE format")
+
+    fmt = None
+    pos = 12
+    while pos <= len(data) - 8:
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        body = pos + 8
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                raise ValueError("Invalid WAV file: fmt subchunk too short")
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', data[body:body + 16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                format_tag = struct.unpack('<H', data[body + 24:body + 26])[0]
+            fmt = (format_tag, channels, (bits + 7) // 8, sample_rate)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("Invalid WAV file: data subchunk before fmt")
+            return fmt + (body, chunk_size)
+        pos = body + chunk_size + (chunk_size & 1)  # 子块按偶数字节对齐
+
+    raise ValueError("Invalid WAV file: no data subchunk found")
+
+
+def design_resample_filter(up: int, down: int) -> np.ndarray:
+    """Kaiser 窗 sinc 低通滤波器，截止频率取两个采样率中较低者的奈奎斯特频率，增益为 up"""
+    max_rate = max(up, down)
+    half_len = RESAMPLE_HALF_WIDTH * max_rate
+    t = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    h = np.sinc(t / max_rate) * np.kaiser(2 * half_len + 1, RESAMPLE_KAISER_BETA)
+    return h * (up / h.sum())
+
+
+class PcmNormalizer:
+    """把任意块大小的 PCM 流转换为单声道 16bit 小端 PCM
+
+    convert() 可重复调用，输入块不需要按采样帧对齐；输入结束后调用 flush() 取出重采样滤波器中的剩余样本
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, sample_width: int = 2,
+                 format_tag: int = WAVE_FORMAT_PCM, target_rate: int = 16000):
+        if not self.supports(format_tag, sample_width):
+            raise ValueError(f"Unsupported PCM encoding: format={format_tag:#06x} width={sample_width}")
+        if channels <= 0 or sample_rate <= 0 or target_rate <= 0:
+            raise ValueError(f"Invalid PCM parameters: rate={sample_rate} channels={channels}")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.format_tag = format_tag
+        self.target_rate = target_rate
+        self.frame_size = channels * sample_width
+        self._remainder = b''  # 不足一个采样帧的尾部字节
+
+        divisor = math.gcd(sample_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = sample_rate // divisor
+        self.resampling = self.up != self.down
+        if self.resampling:
+            h = design_resample_filter(self.up, self.down)
+            self._delay = (len(h) - 1) // 2
+            self._taps = -(-len(h) // self.up)  # 每个相位的抽头数
+            padded = np.zeros(self._taps * self.up)
+            padded[:len(h)] = h
+            # _bank[p, j] = h[p + j * up]，按输出点所在的相位取一行与最近的输入样本做点积
+            self._bank = padded.reshape(self._taps, self.up).T.astype(np.float32)
+            self._tap_offsets = np.arange(self._taps)
+            self._history = np.zeros(self._taps - 1, dtype=np.float32)
+            self._history_start = -(self._taps - 1)  # _history[0] 对应的输入样本序号
+            self._inputs = 0
+            self._outputs = 0
+
+    @staticmethod
+    def supports(format_tag: int, sample_width: int) -> bool:
+        if format_tag == WAVE_FORMAT_PCM:
+            return sample_width in (1, 2, 3, 4)
+        if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            return sample_width in (4, 8)
+        if format_tag in G711_TABLES:
+            return sample_width == 1
+        return False
+
+    @classmethod
+    def from_codec(cls, codec: str, sample_rate: int, channels: int = 1, bits: int = 16,
+                   target_rate: int = 16000) -> 'PcmNormalizer':
+        """按 AudioFormat 的 codec/rate/channel/bits 创建，G.711 的 bits 为 8"""
+        if codec not in CODEC_FORMAT_TAGS:
+            raise ValueError(f"Unsupported codec: {codec}")
+        return cls(sample_rate, channels, bits // 8, CODEC_FORMAT_TAGS[codec], target_rate)
+
+    def _decode(self, data: bytes) -> np.ndarray:
+        """解码为以 16bit 满幅为刻度的 float32 单声道样本"""
+        width = self.sample_width
+        if self.format_tag in G711_TABLES:
+            # 查表解码，每个码字一次索引
+            samples = G711_TABLES[self.format_tag][np.frombuffer(data, dtype=np.uint8)]
+        elif self.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            samples = np.frombuffer(data, dtype='<f4' if width == 4 else '<f8').astype(np.float32) * 32768.0
+        elif width == 1:
+            samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) * 256.0
+        elif width == 2:
+            samples = np.frombuffer(data, dtype='<i2').astype(np.float32)
+        elif width == 3:
+            # 三字节放入 int32 的高位，符号位随之扩展
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            wide = np.zeros((len(raw), 4), dtype=np.uint8)
+            wide[:, 1:] = raw
+            samples = wide.view('<i4').ravel().astype(np.float32) / 65536.0
+        else:
+            samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 65536.0
+
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples
+
+    def _resample(self, samples: np.ndarray, limit: int = -1) -> np.ndarray:
+        """多相滤波：只计算实际输出的样本，不生成插零后的中间序列"""
+        buffer = np.concatenate((self._history, samples))
+        last = self._history_start + len(buffer) - 1
+        # 输出点 k 对应插值后序列的位置 k * down + delay，需要的最新输入样本为该位置整除 up
+        end = (last * self.up + self.up - 1 - self._delay) // self.down + 1
+        if limit >= 0:
+            end = min(end, limit)
+        k = np.arange(self._outputs, max(end, self._outputs), dtype=np.int64)
+        position = k * self.down + self._delay
+        newest = position // self.up - self._history_start
+        if self.down == 1:
+            output = self._upsample(buffer, position, newest)
+        else:
+            window = buffer[newest[:, None] - self._tap_offsets]
+            output = np.einsum('ij,ij->i', window, self._bank[position % self.up])
+
+        self._outputs += len(k)
+        keep = self._taps - 1
+        self._history = buffer[len(buffer) - keep:] if keep else buffer[:0]
+        self._history_start = last - keep + 1
+        return output
+
+    def _upsample(self, buffer: np.ndarray, position: np.ndarray, newest: np.ndarray) -> np.ndarray:
+        """整数倍上采样（如电话音频 8kHz→16kHz）：每个相位对应一次卷积，输出交错排列
+
+        相邻的 up 个输出点依次落在各个相位上，同一相位的输出对应连续的输入样本
+        """
+        output = np.empty(len(position), dtype=np.float32)
+        for i in range(min(self.up, len(position))):
+            # 'valid' 卷积的第 m 个结果以 buffer[m + taps - 1] 为最新样本
+            filtered = np.convolve(buffer, self._bank[position[i] % self.up], 'valid')
+            start = newest[i] - (self._taps - 1)
+            count = len(output[i::self.up])
+            output[i::self.up] = filtered[start:start + count]
+        return output
+
+    @staticmethod
+    def _encode(samples: np.ndarray) -> bytes:
+        return np.clip(np.rint(samples), -32768, 32767).astype('<i2').tobytes()
+
+    def convert(self, data: bytes) -> bytes:
+        if self._remainder:
+            data = self._remainder + data
+        usable = len(data) - len(data) % self.frame_size
+        self._remainder = bytes(data[usable:])
+        if not usable:
+            return b''
+        samples = self._decode(memoryview(data)[:usable])
+        if self.resampling:
+            self._inputs += len(samples)
+            samples = self._resample(samples)
+        return self._encode(samples)
+
+    def flush(self) -> bytes:
+        """输入结束：补零推出滤波器延迟内的样本，输出总数为 ceil(输入样本数 * up / down)"""
+        self._remainder = b''
+        if not self.resampling:
+            return b''
+        total = -(-self._inputs * self.up // self.down)
+        padding = np.zeros(self._taps + self._delay // self.up + 1, dtype=np.float32)
+        return self._encode(self._resample(padding, limit=total))
+
+
+async def normalize_stream(stream: AsyncIterable[bytes], normalizer: PcmNormalizer) -> AsyncGenerator[bytes, None]:
+    """逐块转换异步音频流，流结束时输出滤波器中的剩余样本"""
+    async for chunk in stream:
+        yield normalizer.convert(chunk)
+    yield normalizer.flush()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+批量转写：并发处理目录或清单中的录音文件
+- 同时运行的会话数由 --concurrency 控制
+- 结果逐条追加写入 JSONL
+- 已完成的文件记录在进度清单中，进程崩溃后重新运行会自动跳过
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sauc_websocket_demo import AsrWsClient, EnergyVad, PacingPolicy, PayloadCompressor, logger
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".aac", ".amr", ".flac", ".ogg", ".opus"}
+
+
+def list_input_dir(input_dir: str) -> List[str]:
+    """递归列出目录中的音频文件，按路径排序保证多次运行顺序一致"""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def read_manifest(manifest_path: str) -> List[str]:
+    """清单文件每行一个音频路径，空行和 # 开头的行会被忽略"""
+    with open(manifest_path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_progress(progress_path: str) -> Set[str]:
+    done = set()
+    if not os.path.exists(progress_path):
+        return done
+    with open(progress_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 崩溃时可能留下半行，忽略即可
+                continue
+            if record.get("status") == "done":
+                done.add(record["file"])
+    return done
+
+
+class BatchTranscriber:
+    def __init__(self, url: str, output_path: str, progress_path: str,
+                 concurrency: int = 4, segment_duration: int = 200,
+                 compressor: Optional[PayloadCompressor] = None,
+                 pacing: Optional[PacingPolicy] = None,
+                 vad: Optional['EnergyVad'] = None):
+        if concurrency <= 0:
+            raise ValueError("Concurrency must be positive")
+        self.url = url
+        self.output_path = output_path
+        self.progress_path = progress_path
+        self.concurrency = concurrency
+        self.segment_duration = segment_duration
+        self.compressor = compressor or PayloadCompressor()
+        # 离线文件默认不按实时节奏发送
+        self.pacing = pacing or PacingPolicy.from_spec(PacingPolicy.MAX)
+        self.vad = vad
+        self.audio_seconds = 0.0
+        self.succeeded = 0
+        self.failed = 0
+
+    async def transcribe(self, file_path: str) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"file": file_path}
+        start = time.monotonic()
+        try:
+            async with AsrWsClient(self.url, self.segment_duration, self.compressor, self.pacing,
+                                   vad=self.vad) as client:
+                async for response in client.execute(file_path, finals_only=True):
+                    payload = response.payload_msg or {}
+                    record["code"] = response.code
+                    record["result"] = payload.get("result")
+                    record["audio_info"] = payload.get("audio_info")
+                    if response.code != 0:
+                        record["error"] = payload
+                if client.vad_session is not None:
+                    record["vad_skipped_ratio"] = round(client.vad_session.skipped_ratio, 4)
+            record["status"] = "done" if record.get("code", 0) == 0 and "result" in record else "failed"
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["elapsed"] = round(time.monotonic() - start, 3)
+        return record
+
+    def _write(self, output, progress, record: Dict[str, Any]) -> None:
+        # 先落结果再记进度：崩溃时最多重复转写一个文件，不会丢结果
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        progress.write(json.dumps({"file": record["file"], "status": record["status"]}) + "\n")
+        progress.flush()
+
+        if record["status"] == "done":
+            self.succeeded += 1
+            duration = (record.get("audio_info") or {}).get("duration")
+            if duration:
+                self.audio_seconds += duration / 1000
+        else:
+            self.failed += 1
+            logger.error(f"Transcription failed for {record['file']}: {record.get('error')}")
+
+    async def run(self, paths: Iterable[str]) -> None:
+        done = load_progress(self.progress_path)
+        pending = [path for path in paths if path not in done]
+        logger.info(f"Batch: {len(pending)} files to transcribe, {len(done)} already done, "
+                    f"concurrency={self.concurrency}")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for path in pending:
+            queue.put_nowait(path)
+
+        start = time.monotonic()
+        with open(self.output_path, "a", encoding="utf-8") as output, \
+                open(self.progress_path, "a", encoding="utf-8") as progress:
+
+            async def worker():
+                while True:
+                    try:
+                        path = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    record = await self.transcribe(path)
+                    self._write(output, progress, record)
+
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+
+        wall = time.monotonic() - start
+        speed = self.audio_seconds / wall if wall > 0 else 0.0
+        logger.info(f"Batch finished: {self.succeeded} done, {self.failed} failed, "
+                    f"{self.audio_seconds / 3600:.2f} audio hours in {wall / 3600:.2f} hours ({speed:.1f}x realtime)")
+        if self.vad is not None:
+            logger.info(f"VAD skipped {self.vad.skipped_ratio:.1%} of {self.vad.total_ms / 3600000:.2f} audio hours")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="ASR batch transcription")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", type=str, help="Directory of audio files (searched recursively)")
+    source.add_argument("--manifest", type=str, help="Text file with one audio path per line")
+    parser.add_argument("--output", type=str, default="results.jsonl", help="Result JSONL file")
+    parser.add_argument("--progress", type=str, default=None,
+                        help="Progress manifest used for resuming, default: <output>.progress")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max concurrent ASR sessions")
+    parser.add_argument("--url", type=str, default="wss://openspeech.bytedance.com/api/v3/sauc/bigmodel_nostream",
+                        help="WebSocket URL")
+    parser.add_argument("--seg-duration", type=int, default=200,
+                        help="Audio duration(ms) per packet, default:200")
+    parser.add_argument("--compression", type=str, default="gzip",
+                        help="Payload compression: none | gzip[:level[:min_bytes]], default:gzip")
+    parser.add_argument("--pacing", type=str, default="max",
+                        help="Send pacing: realtime | x<N> (N times realtime) | max, default:max")
+    parser.add_argument("--vad", type=str, default=None,
+                        help="Skip long silences: energy[:threshold_db[:hangover_ms[:preroll_ms]]] (requires NumPy)")
+    args = parser.parse_args()
+    if args.vad and EnergyVad is None:
+        parser.error("--vad requires NumPy")
+
+    paths = list_input_dir(args.input_dir) if args.input_dir else read_manifest(args.manifest)
+    transcriber = BatchTranscriber(
+        args.url,
+        args.output,
+        args.progress or args.output + ".progress",
+        concurrency=args.concurrency,
+        segment_duration=args.seg_duration,
+        compressor=PayloadCompressor.from_spec(args.compression),
+        pacing=PacingPolicy.from_spec(args.pacing),
+        vad=EnergyVad.from_spec(args.vad) if args.vad else None
+    )
+    await transcriber.run(paths)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+    # 用法：
+    # python3 sauc_batch.py --input-dir /data/recordings --output results.jsonl --concurrency 16
@@ -0,0 +1,209 @@
+"""
+端到端延迟统计
+- 每个会话按 seq 记录音频包的发送时间，收到响应时用 payload_sequence 对应回发送时间
+- 统计首个中间结果耗时、中间结果滞后和最终结果延迟，汇总为直方图
+- 启用发送队列时，记录入队时的队列深度，以及合并、丢弃的分段数
+- 支持以字典形式读取，或导出 Prometheus 文本格式；多进程时用 merge() 汇总各进程的统计
+未启用时客户端不会创建任何统计对象
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+# 直方图桶上界（秒）
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+# 发送队列深度（分段数）的桶上界
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶对应 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: 'Histogram') -> None:
+        """累加另一个相同分桶的直方图，用于汇总多个进程的统计"""
+        if other.buckets != self.buckets:
+            raise ValueError(f"Cannot merge histogram {other.name}: bucket bounds differ")
+        for i, bucket_count in enumerate(other.counts):
+            self.counts[i] += bucket_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶估算分位数，返回所在桶的上界"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+    def to_prometheus(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum:.6f}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class SessionLatency:
+    """单个会话的延迟记录，由 LatencyMetrics.session() 创建"""
+
+    def __init__(self, metrics: 'LatencyMetrics'):
+        self.metrics = metrics
+        self.first_send_time: Optional[float] = None
+        self.first_partial_latency: Optional[float] = None
+        # 按发送顺序保存 (seq, 发送时间)，收到响应后弹出已确认的部分，长度不会无限增长
+        self._sent: Deque[Tuple[int, float]] = deque()
+
+    def on_handshake(self, seconds: float) -> None:
+        self.metrics.handshake.observe(seconds)
+
+    def on_send(self, seq: int) -> None:
+        now = time.monotonic()
+        if self.first_send_time is None:
+            self.first_send_time = now
+        self._sent.append((seq, now))
+
+    def on_response(self, payload_sequence: int, is_final: bool) -> None:
+        now = time.monotonic()
+        if self.first_send_time is None:
+            return
+
+        seq = abs(payload_sequence)
+        sent_time = None
+        while self._sent and self._sent[0][0] <= seq:
+            sent_time = self._sent.popleft()[1]
+
+        if is_final:
+            if sent_time is not None:
+                self.metrics.final_latency.observe(now - sent_time)
+            return
+
+        if self.first_partial_latency is None:
+            self.first_partial_latency = now - self.first_send_time
+            self.metrics.time_to_first_partial.observe(self.first_partial_latency)
+        if sent_time is not None:
+            self.metrics.partial_lag.observe(now - sent_time)
+
+    def on_enqueue(self, depth: int) -> None:
+        self.metrics.send_queue_depth.observe(depth)
+
+    def on_coalesce(self, segments: int) -> None:
+        self.metrics.coalesced_frames += 1
+        self.metrics.coalesced_segments += segments - 1
+
+    def on_drop(self, size: int) -> None:
+        self.metrics.dropped_segments += 1
+        self.metrics.dropped_bytes += size
+
+
+class LatencyMetrics:
+    """多个会话共享的延迟直方图"""
+
+    def __init__(self, prefix: str = "sauc", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.sessions = 0
+        self.handshake = Histogram(
+            f"{prefix}_handshake_seconds",
+            "Time from sending the full client request to its response", buckets)
+        self.time_to_first_partial = Histogram(
+            f"{prefix}_time_to_first_partial_seconds",
+            "Time from the first audio packet to the first partial result", buckets)
+        self.partial_lag = Histogram(
+            f"{prefix}_partial_lag_seconds",
+            "Time from sending an audio packet to the partial result that covers it", buckets)
+        self.final_latency = Histogram(
+            f"{prefix}_final_latency_seconds",
+            "Time from sending the last audio packet to the final result", buckets)
+        self.send_queue_depth = Histogram(
+            f"{prefix}_send_queue_depth",
+            "Audio segments already waiting in the send queue when a segment is enqueued", QUEUE_DEPTH_BUCKETS)
+        # 发送队列计数器
+        self.coalesced_frames = 0  # 合并了多个分段的帧数
+        self.coalesced_segments = 0  # 并入其他帧、没有单独发送的分段数
+        self.dropped_segments = 0
+        self.dropped_bytes = 0
+
+    @property
+    def histograms(self) -> List[Histogram]:
+        return [self.handshake, self.time_to_first_partial, self.partial_lag, self.final_latency,
+                self.send_queue_depth]
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        return {
+            "coalesced_frames": self.coalesced_frames,
+            "coalesced_segments": self.coalesced_segments,
+            "dropped_segments": self.dropped_segments,
+            "dropped_bytes": self.dropped_bytes,
+        }
+
+    def merge(self, other: 'LatencyMetrics') -> None:
+        self.sessions += other.sessions
+        for name, value in other.counters.items():
+            setattr(self, name, getattr(self, name) + value)
+        for histogram, other_histogram in zip(self.histograms, other.histograms):
+            histogram.merge(other_histogram)
+
+    def session(self) -> SessionLatency:
+        self.sessions += 1
+        return SessionLatency(self)
+
+    def snapshot(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"sessions": self.sessions}
+        result.update(self.counters)
+        for histogram in self.histograms:
+            result[histogram.name] = histogram.snapshot()
+        return result
+
+    def to_prometheus(self) -> str:
+        lines = [
+            f"# HELP {self.prefix}_sessions_total ASR sessions started with latency tracking",
+            f"# TYPE {self.prefix}_sessions_total counter",
+            f"{self.prefix}_sessions_total {self.sessions}",
+        ]
+        help_texts = {
+            "coalesced_frames": "Audio frames that carry more than one coalesced segment",
+            "coalesced_segments": "Audio segments merged into another frame instead of sent on their own",
+            "dropped_segments": "Audio segments dropped because the send queue was full",
+            "dropped_bytes": "Audio bytes dropped because the send queue was full",
+        }
+        for name, value in self.counters.items():
+            lines.extend([
+                f"# HELP {self.prefix}_{name}_total {help_texts[name]}",
+                f"# TYPE {self.prefix}_{name}_total counter",
+                f"{self.prefix}_{name}_total {value}",
+            ])
+        for histogram in self.histograms:
+            lines.extend(histogram.to_prometheus())
+        return "\n".join(lines) + "\n"
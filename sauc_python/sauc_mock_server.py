@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+本地 SAUC 协议模拟服务
+实现与 RequestBuilder / ResponseParser 相同的二进制协议，用于离线测试和压测：
+- 完整客户端请求、纯音频包、负序号结束包、错误帧、gzip 压缩
+- 按收到的音频时长生成模拟的中间结果和最终结果
+- 可配置处理延迟、抖动和错误注入
+不需要网络和密钥
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web, WSMsgType
+
+from sauc_websocket_demo import (
+    CompressionType,
+    MessageType,
+    MessageTypeSpecificFlags,
+    ProtocolVersion,
+    SerializationType,
+    logger,
+)
+
+CLIENT_FRAME_HEADER = struct.Struct('>BBBBiI')
+SYNTHETIC_TEXT = "您好请问最近睡眠怎么样平时有没有按时吃药血压控制得还可以吗"
+
+# 常见错误码
+ERROR_INVALID_REQUEST = 45000001
+ERROR_SERVER_BUSY = 55000031
+
+
+class MockServerConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_code: int = ERROR_SERVER_BUSY,
+                 ms_per_char: int = 200, utterance_ms: int = 3000,
+                 compression: int = CompressionType.GZIP, seed: Optional[int] = None,
+                 drop_rate: float = 0.0, read_delay_ms: float = 0.0):
+        self.latency_ms = latency_ms  # 每帧的处理延迟
+        self.jitter_ms = jitter_ms  # 在处理延迟上叠加的随机抖动
+        self.error_rate = error_rate  # 每个音频包触发错误帧的概率
+        self.error_code = error_code
+        self.ms_per_char = ms_per_char  # 每多少毫秒音频生成一个字
+        self.utterance_ms = utterance_ms  # 每句话的时长，超过后该句标记为 definite
+        self.compression = compression
+        self.seed = seed
+        self.drop_rate = drop_rate  # 每个音频包触发连接中断（不发送结果、直接断开TCP）的概率
+        self.read_delay_ms = read_delay_ms  # 每读一帧后暂停读取的时长，模拟慢速网络，客户端的发送缓冲区会逐渐积压
+
+
+def parse_client_frame(data: bytes) -> Tuple[int, int, int, Any]:
+    """解析客户端帧，返回 (message_type, flags, seq, payload)，完整请求的 payload 为解析后的 JSON"""
+    if len(data) < CLIENT_FRAME_HEADER.size:
+        raise ValueError(f"Client frame too short: {len(data)} bytes")
+    byte0, byte1, byte2, _, seq, payload_size = CLIENT_FRAME_HEADER.unpack_from(data)
+    header_size = (byte0 & 0x0f) * 4
+    message_type = byte1 >> 4
+    flags = byte1 & 0x0f
+    serialization = byte2 >> 4
+    compression = byte2 & 0x0f
+
+    start = header_size + 8
+    payload = data[start:start + payload_size]
+    if len(payload) != payload_size:
+        raise ValueError(f"Client frame truncated: expected {payload_size} payload bytes, got {len(payload)}")
+    if compression == CompressionType.GZIP:
+        payload = gzip.decompress(payload)
+    if message_type == MessageType.CLIENT_FULL_REQUEST and serialization == SerializationType.JSON:
+        payload = json.loads(payload.decode('utf-8'))
+    return message_type, flags, seq, payload
+
+
+def build_server_frame(seq: int, payload: Dict[str, Any], is_last: bool = False,
+                       compression: int = CompressionType.GZIP) -> bytes:
+    flags = MessageTypeSpecificFlags.NEG_WITH_SEQUENCE if is_last else MessageTypeSpecificFlags.POS_SEQUENCE
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    if compression == CompressionType.GZIP:
+        body = gzip.compress(body)
+    header = bytes([
+        (ProtocolVersion.V1 << 4) | 1,
+        (MessageType.SERVER_FULL_RESPONSE << 4) | flags,
+        (SerializationType.JSON << 4) | compression,
+        0x00
+    ])
+    return header + struct.pack('>iI', seq, len(body)) + body
+
+
+def build_error_frame(code: int, message: str, compression: int = CompressionType.GZIP) -> bytes:
+    body = json.dumps({"error": message}).encode('utf-8')
+    if compression == CompressionType.GZIP:
+        body = gzip.compress(body)
+    header = bytes([
+        (ProtocolVersion.V1 << 4) | 1,
+        (MessageType.SERVER_ERROR_RESPONSE << 4) | MessageTypeSpecificFlags.NO_SEQUENCE,
+        (SerializationType.JSON << 4) | compression,
+        0x00
+    ])
+    return header + struct.pack('>iI', code, len(body)) + body
+
+
+class MockAsrSession:
+    """单个连接的识别状态：按收到的音频字节数推算时长，生成累积结果"""
+
+    def __init__(self, config: MockServerConfig, stream_partials: bool):
+        self.config = config
+        self.stream_partials = stream_partials
+        self.bytes_per_ms = 32  # 默认16kHz/16bit/单声道，收到完整请求后按配置更新
+        self.audio_bytes = 0
+        self.configured = False
+
+    def configure(self, request: Dict[str, Any]) -> None:
+        audio = request.get("audio", {})
+        rate = audio.get("rate", 16000)
+        bits = audio.get("bits", 16)
+        channel = audio.get("channel", 1)
+        if rate not in (8000, 16000) or bits != 16 or channel not in (1, 2):
+            raise ValueError(f"unsupported audio config: rate={rate} bits={bits} channel={channel}")
+        self.bytes_per_ms = max(rate * bits // 8 * channel // 1000, 1)
+        self.configured = True
+
+    @property
+    def duration_ms(self) -> int:
+        return self.audio_bytes // self.bytes_per_ms
+
+    def result(self, final: bool = False) -> Dict[str, Any]:
+        duration = self.duration_ms
+        utterances: List[Dict[str, Any]] = []
+        start = 0
+        while start < duration:
+            end = min(start + self.config.utterance_ms, duration)
+            first_char = start // self.config.ms_per_char
+            last_char = max(end // self.config.ms_per_char, first_char + 1)
+            text = "".join(
+                SYNTHETIC_TEXT[i % len(SYNTHETIC_TEXT)] for i in range(first_char, last_char)
+            )
+            utterances.append({
+                "definite": final or end - start >= self.config.utterance_ms,
+                "start_time": start,
+                "end_time": end,
+                "text": text
+            })
+            start = end
+        return {
+            "audio_info": {"duration": duration},
+            "result": {
+                "text": "".join(utterance["text"] for utterance in utterances),
+                "utterances": utterances
+            }
+        }
+
+
+class MockAsrServer:
+    def __init__(self, config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockServerConfig()
+        self.host = host
+        self.port = port
+        self.rng = random.Random(self.config.seed)
+        self.sessions = 0
+        self.active_sessions = 0
+        self.frames_received = 0
+        self.errors_injected = 0
+        self.connections_dropped = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/api/v3/sauc/bigmodel"
+
+    @property
+    def nostream_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/api/v3/sauc/bigmodel_nostream"
+
+    async def start(self) -> 'MockAsrServer':
+        app = web.Application()
+        app.router.add_get("/api/v3/sauc/{model}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # port=0 时取实际分配的端口
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Mock ASR server listening on {self.url}")
+        return self
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> 'MockAsrServer':
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.stop()
+
+    def _delay(self) -> float:
+        jitter = self.rng.uniform(-self.config.jitter_ms, self.config.jitter_ms) if self.config.jitter_ms else 0.0
+        return max(self.config.latency_ms + jitter, 0.0) / 1000
+
+    async def _respond(self, ws: web.WebSocketResponse, queue: asyncio.Queue) -> None:
+        """按到达顺序发送响应，每帧在到达时间基础上加处理延迟，抖动不会打乱顺序"""
+        loop = asyncio.get_running_loop()
+        last_due = 0.0
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            due, frame, close = item
+            due = max(due, last_due)
+            last_due = due
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            if ws.closed:
+                return
+            try:
+                await ws.send_bytes(frame)
+            except ConnectionResetError:
+                return
+            if close:
+                await ws.close()
+                return
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self.sessions += 1
+        self.active_sessions += 1
+
+        loop = asyncio.get_running_loop()
+        stream_partials = not request.match_info["model"].endswith("nostream")
+        session = MockAsrSession(self.config, stream_partials)
+        compression = self.config.compression
+        queue: asyncio.Queue = asyncio.Queue()
+        responder = asyncio.create_task(self._respond(ws, queue))
+
+        def reply(frame: bytes, close: bool = False) -> None:
+            queue.put_nowait((loop.time() + self._delay(), frame, close))
+
+        dropped = False
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.BINARY:
+                    continue
+                self.frames_received += 1
+                if self.config.read_delay_ms:
+                    await asyncio.sleep(self.config.read_delay_ms / 1000)
+                try:
+                    message_type, flags, seq, payload = parse_client_frame(msg.data)
+                except Exception as e:
+                    reply(build_error_frame(ERROR_INVALID_REQUEST, str(e), compression), close=True)
+                    break
+
+                if message_type == MessageType.CLIENT_FULL_REQUEST:
+                    try:
+                        session.configure(payload)
+                    except ValueError as e:
+                        reply(build_error_frame(ERROR_INVALID_REQUEST, str(e), compression), close=True)
+                        break
+                    reply(build_server_frame(seq, session.result(), compression=compression))
+                    continue
+
+                if message_type != MessageType.CLIENT_AUDIO_ONLY_REQUEST or not session.configured:
+                    reply(build_error_frame(ERROR_INVALID_REQUEST, "audio before full client request", compression),
+                          close=True)
+                    break
+
+                if self.config.error_rate and self.rng.random() < self.config.error_rate:
+                    self.errors_injected += 1
+                    reply(build_error_frame(self.config.error_code, "injected error", compression), close=True)
+                    break
+
+                if self.config.drop_rate and self.rng.random() < self.config.drop_rate:
+                    self.connections_dropped += 1
+                    dropped = True
+                    break
+
+                session.audio_bytes += len(payload)
+                is_last = bool(flags & 0x02) or seq < 0
+                if is_last:
+                    reply(build_server_frame(seq, session.result(final=True), is_last=True,
+                                             compression=compression), close=True)
+                    break
+                if session.stream_partials:
+                    reply(build_server_frame(seq, session.result(), compression=compression))
+        finally:
+            if dropped:
+                responder.cancel()
+                request.transport.abort()
+            queue.put_nowait(None)
+            try:
+                await responder
+            except asyncio.CancelledError:
+                pass
+            self.active_sessions -= 1
+        return ws
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local SAUC protocol mock server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Processing latency per frame (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random jitter added to latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an error frame per audio packet")
+    parser.add_argument("--error-code", type=int, default=ERROR_SERVER_BUSY, help="Code used for injected errors")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="Probability of dropping the connection per audio packet")
+    parser.add_argument("--read-delay", type=float, default=0.0,
+                        help="Pause after reading each frame (ms) to simulate a slow network")
+    parser.add_argument("--ms-per-char", type=int, default=200,
+                        help="Audio milliseconds per synthetic character, smaller values give larger results")
+    parser.add_argument("--no-gzip", action="store_true", help="Send uncompressed responses")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter and error injection")
+    args = parser.parse_args()
+
+    config = MockServerConfig(
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        error_rate=args.error_rate,
+        error_code=args.error_code,
+        ms_per_char=args.ms_per_char,
+        compression=CompressionType.NO_COMPRESSION if args.no_gzip else CompressionType.GZIP,
+        seed=args.seed,
+        drop_rate=args.drop_rate,
+        read_delay_ms=args.read_delay
+    )
+    async with MockAsrServer(config, args.host, args.port):
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+    # 用法：
+    # python3 sauc_mock_server.py --port 8765 --latency 50 --jitter 20
+    # python3 sauc_websocket_demo.py --file audio.wav --url ws://127.0.0.1:8765/api/v3/sauc/bigmodel
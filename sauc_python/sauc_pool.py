@@ -0,0 +1,262 @@
+"""
+ASR 会话池
+- 所有会话共用一个 aiohttp.ClientSession（连接器、DNS 缓存、SSL 上下文只创建一次）
+- 按通话 ID 登记和查找会话，限制同时在用的会话数
+- 后台定期清理长时间无活动或连接已断开却没有归还的会话
+- 可选热备：预先保持若干已连接并完成握手的会话，通话开始时直接取用，后台自动补充
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, List, Optional
+
+import aiohttp
+
+from sauc_metrics import LatencyMetrics
+from sauc_scheduler import TickScheduler
+from sauc_websocket_demo import (
+    DEFAULT_COMPRESSOR,
+    REALTIME_PACING,
+    WAV_16K_MONO,
+    AsrWsClient,
+    AudioFormat,
+    CodecOffload,
+    PacingPolicy,
+    PayloadCompressor,
+    SendQueuePolicy,
+    logger,
+)
+
+if TYPE_CHECKING:
+    from sauc_vad import EnergyVad
+
+
+class AsrSessionPool:
+    def __init__(self, url: str, max_sessions: int = 500,
+                 idle_ttl: float = 300.0, dead_ttl: float = 30.0, sweep_interval: float = 10.0,
+                 segment_duration: int = 200,
+                 compressor: PayloadCompressor = DEFAULT_COMPRESSOR,
+                 pacing: PacingPolicy = REALTIME_PACING,
+                 metrics: Optional[LatencyMetrics] = None,
+                 standby: int = 0, standby_max_idle: float = 20.0, standby_retry: float = 1.0,
+                 standby_format: AudioFormat = WAV_16K_MONO,
+                 vad: Optional['EnergyVad'] = None,
+                 reconnect_attempts: int = 0, replay_seconds: float = 10.0,
+                 offload: Optional[CodecOffload] = None,
+                 scheduler: Optional[TickScheduler] = None,
+                 send_queue: Optional[SendQueuePolicy] = None):
+        if max_sessions <= 0:
+            raise ValueError("max_sessions must be positive")
+        if not 0 <= standby <= max_sessions:
+            raise ValueError("standby must be between 0 and max_sessions")
+        self.url = url
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl  # 无任何收发超过该时长的会话会被回收
+        self.dead_ttl = dead_ttl  # 连接已关闭但未归还的会话在该时长后回收
+        self.sweep_interval = sweep_interval
+        self.segment_duration = segment_duration
+        self.compressor = compressor
+        self.pacing = pacing
+        self.metrics = metrics
+        self.vad = vad
+        self.reconnect_attempts = reconnect_attempts  # 通话中途断线时自动重连并重放最近的音频
+        self.replay_seconds = replay_seconds
+        self.offload = offload  # 所有会话共用一个线程池，由调用方负责 shutdown
+        self.scheduler = scheduler  # 所有会话共用的发送节拍
+        self.send_queue = send_queue
+        self.standby = standby  # 热备会话数，占用并发名额
+        self.standby_max_idle = standby_max_idle  # 热备会话闲置超过该时长后重建，避免长期占用配额
+        self.standby_retry = standby_retry  # 预热失败后的重试间隔
+        # 热备会话握手时声明的格式；参数一致的 WAV 与 PCM 可以共用，参数不同的音频取用热备后仍需重新握手
+        self.standby_format = standby_format
+
+        self.http: Optional[aiohttp.ClientSession] = None
+        self._clients: Dict[str, AsrWsClient] = {}
+        self._slots = asyncio.Semaphore(max_sessions)
+        self._sweeper: Optional[asyncio.Task] = None
+        self._standby_clients: Deque[AsrWsClient] = deque()
+        self._replenish_needed = asyncio.Event()
+        self._replenisher: Optional[asyncio.Task] = None
+        self.created = 0
+        self.evicted = 0
+        self.warm_hits = 0
+        self.warm_misses = 0
+
+    async def start(self) -> 'AsrSessionPool':
+        # WebSocket连接在整个会话期间都占用连接器的一个连接，上限需与会话数一致
+        connector = aiohttp.TCPConnector(
+            limit=self.max_sessions,
+            limit_per_host=self.max_sessions,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        )
+        self.http = aiohttp.ClientSession(connector=connector)
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+        if self.standby:
+            self._replenisher = asyncio.create_task(self._replenish_loop())
+            self._replenish_needed.set()
+        return self
+
+    async def close(self) -> None:
+        for task in (self._sweeper, self._replenisher):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sweeper = self._replenisher = None
+        while self._standby_clients:
+            await self._discard(self._standby_clients.popleft())
+        for call_id in list(self._clients):
+            await self.release(call_id)
+        if self.http and not self.http.closed:
+            await self.http.close()
+
+    async def __aenter__(self) -> 'AsrSessionPool':
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    @property
+    def active(self) -> int:
+        return len(self._clients)
+
+    def get(self, call_id: str) -> Optional[AsrWsClient]:
+        return self._clients.get(call_id)
+
+    def _new_client(self) -> AsrWsClient:
+        return AsrWsClient(
+            self.url, self.segment_duration, self.compressor, self.pacing, self.metrics, session=self.http,
+            vad=self.vad, reconnect_attempts=self.reconnect_attempts, replay_seconds=self.replay_seconds,
+            offload=self.offload, scheduler=self.scheduler, send_queue=self.send_queue
+        )
+
+    async def acquire(self, call_id: str, timeout: Optional[float] = None) -> AsrWsClient:
+        """为通话分配一个会话，达到并发上限时等待，timeout 秒后仍无空位则抛出 asyncio.TimeoutError
+
+        有可用热备会话时直接返回已握手的会话（client.prepared 为 True），否则返回新会话，
+        由 execute 负责连接和握手
+        """
+        if self.http is None:
+            raise RuntimeError("Session pool is not started")
+        if call_id in self._clients:
+            raise ValueError(f"Call {call_id} already has an ASR session")
+
+        warm = self._take_standby()
+        if warm is not None:
+            self._clients[call_id] = warm
+            self.warm_hits += 1
+            return warm
+
+        if self.standby:
+            self.warm_misses += 1
+            # 热备用完，名额空出后及时补充
+            self._replenish_needed.set()
+        await asyncio.wait_for(self._slots.acquire(), timeout)
+        client = self._new_client()
+        self._clients[call_id] = client
+        self.created += 1
+        return client
+
+    async def release(self, call_id: str) -> None:
+        client = self._clients.pop(call_id, None)
+        if client is None:
+            return
+        try:
+            if client.conn and not client.conn.closed:
+                await client.conn.close()
+        finally:
+            self._slots.release()
+            # 名额用满时补充循环会提前停下，归还名额后重新唤醒
+            self._replenish_needed.set()
+
+    def _take_standby(self) -> Optional[AsrWsClient]:
+        while self._standby_clients:
+            client = self._standby_clients.popleft()
+            self._replenish_needed.set()
+            if client.conn is not None and not client.conn.closed:
+                return client
+            # 闲置期间被服务端断开的会话直接丢弃
+            asyncio.create_task(self._discard(client))
+        return None
+
+    async def _discard(self, client: AsrWsClient) -> None:
+        try:
+            if client.conn and not client.conn.closed:
+                await client.conn.close()
+        finally:
+            self._slots.release()
+            self._replenish_needed.set()
+
+    async def _replenish_loop(self) -> None:
+        while True:
+            await self._replenish_needed.wait()
+            self._replenish_needed.clear()
+            # 只使用空闲名额预热，不与等待中的通话抢占
+            while len(self._standby_clients) < self.standby and not self._slots.locked():
+                await self._slots.acquire()
+                client = self._new_client()
+                try:
+                    await client.prepare(self.standby_format)
+                except Exception as e:
+                    logger.error(f"Failed to prepare standby ASR session: {e}")
+                    await self._discard(client)
+                    await asyncio.sleep(self.standby_retry)
+                    self._replenish_needed.set()
+                    break
+                self.created += 1
+                self._standby_clients.append(client)
+
+    @asynccontextmanager
+    async def session(self, call_id: str, timeout: Optional[float] = None) -> AsyncIterator[AsrWsClient]:
+        client = await self.acquire(call_id, timeout)
+        try:
+            yield client
+        finally:
+            await self.release(call_id)
+
+    async def evict_expired(self) -> List[str]:
+        now = time.monotonic()
+        expired = []
+        for call_id, client in self._clients.items():
+            idle = now - client.last_activity
+            dead = client.conn is not None and client.conn.closed
+            if idle > self.idle_ttl or (dead and idle > self.dead_ttl):
+                expired.append(call_id)
+        for call_id in expired:
+            logger.warning(f"Evicting idle ASR session for call {call_id}")
+            await self.release(call_id)
+        self.evicted += len(expired)
+
+        # 热备会话闲置过久或已断开时重建
+        stale = [client for client in self._standby_clients
+                 if now - client.last_activity > self.standby_max_idle or client.conn.closed]
+        for client in stale:
+            self._standby_clients.remove(client)
+            await self._discard(client)
+        if stale:
+            self._replenish_needed.set()
+        return expired
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_expired()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "evicted": self.evicted,
+            "standby": len(self._standby_clients),
+            "warm_hits": self.warm_hits,
+            "warm_misses": self.warm_misses,
+        }
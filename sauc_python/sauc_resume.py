@@ -0,0 +1,160 @@
+"""
+断线重连与续传
+- ReplayBuffer：固定容量的环形缓冲区，只保留最近若干秒已发送的音频，内存占用与通话时长无关
+- TranscriptStitcher：记录已确定的句子，重连后把新会话的结果平移到整通电话的时间轴上，
+  并接在已确定的句子之后，调用方看到的是一份连续的转写结果
+- ResumeState：单次识别的续传状态，由 AsrWsClient 在启用重连时创建
+新会话从最后一个已确定句子的结束位置开始重放音频；该位置早于缓冲区起点时，中间的音频无法补发
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayBuffer:
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Replay buffer capacity must be positive")
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self.end = 0  # 累计写入的字节数，即最新数据之后的位置
+
+    @property
+    def start(self) -> int:
+        """缓冲区中最早一个字节的位置"""
+        return max(self.end - self.capacity, 0)
+
+    def append(self, data: bytes) -> None:
+        size = len(data)
+        if size >= self.capacity:
+            # 只需保留最后 capacity 个字节
+            self.end += size - self.capacity
+            data = memoryview(data)[size - self.capacity:]
+            size = self.capacity
+        pos = self.end % self.capacity
+        first = min(size, self.capacity - pos)
+        self._buffer[pos:pos + first] = data[:first]
+        if first < size:
+            self._buffer[:size - first] = data[first:]
+        self.end += size
+
+    def read_from(self, offset: int) -> bytes:
+        """返回从 offset 到最新数据的拷贝，offset 早于缓冲区起点时从起点开始"""
+        offset = min(max(offset, self.start), self.end)
+        size = self.end - offset
+        pos = offset % self.capacity
+        if pos + size <= self.capacity:
+            return bytes(self._buffer[pos:pos + size])
+        return bytes(self._buffer[pos:]) + bytes(self._buffer[:pos + size - self.capacity])
+
+
+def _copy_utterance(utterance: Dict[str, Any], shift_ms: float = 0) -> Dict[str, Any]:
+    """拷贝句子（含 words），可同时平移时间戳"""
+    copied = dict(utterance)
+    for key in ("start_time", "end_time"):
+        if shift_ms and isinstance(copied.get(key), (int, float)):
+            copied[key] = round(copied[key] + shift_ms)
+    if isinstance(copied.get("words"), list):
+        copied["words"] = [_copy_utterance(word, shift_ms) for word in copied["words"]]
+    return copied
+
+
+class TranscriptStitcher:
+    def __init__(self):
+        self.committed: List[Dict[str, Any]] = []  # 整通电话时间轴上已确定的句子
+        # 之前会话留下、接在当前会话结果前面的句子：续传时拷贝一次，之后每条响应按引用共用
+        self.carried: List[Dict[str, Any]] = []
+        self._carried_text = ""
+        self._tentative: List[Dict[str, Any]] = []  # 最近一条响应中尚未确定的句子
+        self.offset_ms = 0.0  # 当前会话的 0 点在整通电话时间轴上的位置
+        self.resumes = 0
+
+    @property
+    def committed_end_ms(self) -> float:
+        return (self.committed[-1].get("end_time") or 0) if self.committed else 0
+
+    def observe(self, payload: Any) -> None:
+        """记录新确定的句子，payload 需已经过 stitch()"""
+        result = payload.get("result") if isinstance(payload, dict) else None
+        utterances = result.get("utterances") if isinstance(result, dict) else None
+        if not utterances:
+            return
+        for utterance in utterances[len(self.committed):]:
+            if not utterance.get("definite"):
+                break
+            self.committed.append(_copy_utterance(utterance))
+        # 拷贝一份：调用方之后可能就地修改响应中的句子
+        self._tentative = [_copy_utterance(u) for u in utterances[len(self.committed):]]
+
+    def resume(self, offset_ms: float) -> None:
+        # 重放起点之前尚未确定的句子不会再被识别，按已确定处理
+        for utterance in self._tentative:
+            end_time = utterance.get("end_time")
+            if not isinstance(end_time, (int, float)) or end_time > offset_ms:
+                break
+            self.committed.append(dict(utterance, definite=True))
+        self._tentative = []
+        self.carried = [_copy_utterance(u) for u in self.committed]
+        self._carried_text = "".join(u.get("text", "") for u in self.carried)
+        self.offset_ms = offset_ms
+        self.resumes += 1
+
+    def stitch(self, payload: Any) -> Any:
+        """把新会话的结果平移并接在已确定句子之后；未重连过时原样返回
+
+        结果中前 len(carried) 个句子是共用的，调用方不能就地修改
+        """
+        if not self.resumes or not isinstance(payload, dict) or not isinstance(payload.get("result"), dict):
+            return payload
+        result = dict(payload["result"])
+        # 只拷贝和平移新会话的句子，耗时与之前会话的长度无关
+        result["utterances"] = self.carried + [_copy_utterance(u, self.offset_ms)
+                                               for u in result.get("utterances") or []]
+        result["text"] = self._carried_text + (result.get("text") or "")
+        stitched = dict(payload, result=result)
+        audio_info = payload.get("audio_info")
+        if isinstance(audio_info, dict) and isinstance(audio_info.get("duration"), (int, float)):
+            stitched["audio_info"] = dict(audio_info, duration=round(audio_info["duration"] + self.offset_ms))
+        return stitched
+
+
+class ResumeState:
+    def __init__(self, bytes_per_second: int, block_align: int, replay_seconds: float,
+                 header_size: int, segment_size: int, audio_format: Any):
+        self.bytes_per_second = bytes_per_second
+        self.block_align = max(block_align, 1)
+        capacity = max(int(bytes_per_second * replay_seconds) // self.block_align, 1) * self.block_align
+        self.replay = ReplayBuffer(capacity)
+        self.stitcher = TranscriptStitcher()
+        self.segment_size = segment_size
+        self.audio_format = audio_format  # 重连后声明的格式：不带WAV头的PCM
+        self._header_left = header_size  # 第一包中的WAV头不进入重放缓冲区
+        self.source_done = False
+        self.reconnects = 0
+        # 连接可用时置位；发送失败或连接断开时清除，发送方等待重连完成
+        self.connected = asyncio.Event()
+        self.connected.set()
+
+    def record(self, packet: bytes, is_last: bool) -> None:
+        if self._header_left:
+            skip = min(self._header_left, len(packet))
+            self._header_left -= skip
+            packet = memoryview(packet)[skip:]
+        self.replay.append(packet)
+        if is_last:
+            self.source_done = True
+
+    def plan_replay(self) -> Tuple[bytes, float]:
+        """返回需要重放的音频及其在整通电话时间轴上的起点（毫秒）"""
+        committed = int(self.stitcher.committed_end_ms * self.bytes_per_second / 1000)
+        committed -= committed % self.block_align
+        if committed < self.replay.start:
+            lost_ms = (self.replay.start - committed) * 1000 / self.bytes_per_second
+            logger.warning(f"Replay buffer too short, {lost_ms:.0f} ms of audio will not be re-recognized")
+        start = min(max(committed, self.replay.start), self.replay.end)
+        offset_ms = start * 1000 / self.bytes_per_second
+        self.stitcher.resume(offset_ms)
+        return self.replay.read_from(start), offset_ms
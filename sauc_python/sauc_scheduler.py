@@ -0,0 +1,98 @@
+"""
+共享发送节拍
+每个会话各自 asyncio.sleep 到自己的截止时间时，1000 路通话每秒产生 5000 次互不对齐的定时器唤醒。
+TickScheduler 是多个会话共用的时间轮：
+- 截止时间向上取整到节拍边界，落入时间轮中对应的槽位；节拍默认 20ms，是分段时长的约数，节拍边界与分段边界对齐
+- 事件循环上只保留一个定时器，指向最近一个有等待者的节拍
+- 节拍到达时一次唤醒该槽位的全部会话，它们在同一轮事件循环中依次发出各自到期的分段；
+  按原截止时间排序唤醒，每个会话在批次中的位置保持稳定，发送间隔不随批次顺序抖动
+节拍越长每次合并的会话越多，但一批会话依次发送的耗时也越长，后面的会话等待越久；
+节拍应不大于发送间隔。截止时间超出时间轮范围时退回普通的 asyncio.sleep
+"""
+
+import asyncio
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class TickScheduler:
+    def __init__(self, tick_ms: int = 20, slots: int = 64):
+        if tick_ms <= 0 or slots <= 0:
+            raise ValueError(f"Invalid scheduler size: tick_ms={tick_ms} slots={slots}")
+        self.tick = tick_ms / 1000
+        self.slots = slots
+        # 每个槽位保存 (节拍序号, [(原截止时间, 等待者)])，同一槽位只会有一个未到期的节拍序号
+        self._wheel: List[Tuple[int, List[Tuple[float, asyncio.Future]]]] = [(-1, []) for _ in range(slots)]
+        self._fired = -1  # 最近一次触发的节拍序号，序号为截止时间除以节拍长度
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._armed = -1  # 定时器指向的节拍序号
+        self.ticks = 0
+        self.wakeups = 0
+        self.max_batch = 0
+
+    async def sleep_until(self, deadline: float) -> None:
+        """等待到 deadline（loop.time() 时间）之后的第一个节拍边界"""
+        loop = asyncio.get_running_loop()
+        index = math.ceil(deadline / self.tick - 1e-9)
+        if index <= self._fired:
+            await asyncio.sleep(0)
+            return
+        # 时间轮范围从最早一个未触发的节拍算起：事件循环滞后时，该节拍可能早于当前时间，
+        # 从当前时间算起会让新截止时间落到它的槽位上
+        oldest = self._armed if self._timer is not None else max(self._fired, math.floor(loop.time() / self.tick))
+        if index - oldest >= self.slots:
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+            return
+
+        slot = index % self.slots
+        slot_index, waiters = self._wheel[slot]
+        if slot_index != index:
+            if slot_index > self._fired and waiters:
+                # 槽位上还有另一个节拍的等待者，不能覆盖
+                await asyncio.sleep(max(deadline - loop.time(), 0))
+                return
+            waiters = []
+            self._wheel[slot] = (index, waiters)
+        waiter = loop.create_future()
+        # 每个等待者一个 future：某个会话被取消时不影响同一节拍的其他会话
+        waiters.append((deadline, waiter))
+        if self._timer is None or index < self._armed:
+            self._arm(loop, index)
+        await waiter
+
+    def _arm(self, loop: asyncio.AbstractEventLoop, index: int) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._armed = index
+        self._timer = loop.call_at(index * self.tick, self._fire, loop, index)
+
+    def _fire(self, loop: asyncio.AbstractEventLoop, index: int) -> None:
+        self._timer = None
+        self._fired = index
+        slot_index, waiters = self._wheel[index % self.slots]
+        if slot_index == index:
+            self._wheel[index % self.slots] = (-1, [])
+            woken = 0
+            waiters.sort(key=lambda item: item[0])
+            for _, waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+                    woken += 1
+            self.ticks += 1
+            self.wakeups += woken
+            self.max_batch = max(self.max_batch, woken)
+        # 找下一个有等待者的节拍
+        for step in range(1, self.slots + 1):
+            slot_index, waiters = self._wheel[(index + step) % self.slots]
+            if slot_index > index and waiters:
+                self._arm(loop, slot_index)
+                break
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tick_ms": round(self.tick * 1000),
+            "ticks": self.ticks,
+            "wakeups": self.wakeups,
+            "mean_batch": self.wakeups / self.ticks if self.ticks else 0.0,
+            "max_batch": self.max_batch,
+        }
@@ -0,0 +1,214 @@
+"""
+共享内存音频环形缓冲区
+- 接入进程与识别进程之间按通话传递音频，每个通话一个 multiprocessing.shared_memory 段
+- 固定数量、固定大小的槽位，槽位大小取一个分段，读写游标保存在共享内存头部
+- 写入方把任意大小的音频块拼满一个槽位再提交；读取方按槽位产出 memoryview，不拷贝、不经过 pickle
+- 空间不足时 write() 拒绝整块写入并计数（溢出），读取方发现计数变化时记录告警
+- 游标和结束标记通过进程间锁发布：锁的获取/释放保证另一方看到新游标时槽位数据和长度已经可见。
+  不传锁时依赖 CPU 按顺序提交写入，只适用于 x86 等强内存序平台，ARM 等平台必须传锁
+- 读取方在缓冲区空时按 poll_interval 轮询，该值由创建方写入头部，决定交接延迟的下限
+单写单读：一个缓冲区只能有一个写入方和一个读取方
+"""
+
+import asyncio
+import contextlib
+import logging
+import struct
+from multiprocessing import shared_memory
+from typing import Any, AsyncGenerator, ContextManager, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RING_SLOTS = 64  # 200ms 分段时约 12.8 秒音频
+POLL_INTERVAL = 0.005  # 默认轮询间隔：读取方或等待空间的写入方在缓冲区空/满时每隔多久检查一次（秒）
+
+# 头部：写游标、读游标、溢出次数、溢出字节数、槽位大小、槽位数、是否已结束、轮询间隔
+# 游标是累计提交/释放的槽位数，只增不减；各自只由一方写入
+_HEADER = struct.Struct('<QQQQIIIf')
+_WRITE, _READ, _OVERRUNS, _DROPPED = 0, 8, 16, 24
+_CLOSED = 40
+_LENGTH = struct.Struct('<I')  # 每个槽位的有效字节数，紧跟在头部之后
+
+
+class SharedAudioRing:
+    """通过 create() 创建（写入方），在另一个进程中用 attach() 按名称打开（读取方）
+
+    lock 是双方共用的 multiprocessing.Lock，只能在启动读取进程时随参数传入（不能经由队列传递）
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool, lock: Optional[Any] = None):
+        self._shm = shm
+        self._buf = shm.buf
+        self.owner = owner
+        self._lock = lock
+        _, _, _, _, self.slot_size, self.slots, _, self.poll_interval = _HEADER.unpack_from(self._buf, 0)
+        self._lengths = _HEADER.size
+        self._data = _HEADER.size + _LENGTH.size * self.slots
+        self._fill = 0  # 写入方：当前槽位已填充的字节数，提交前对读取方不可见
+        self._closed = False
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @classmethod
+    def create(cls, slot_size: int, slots: int = DEFAULT_RING_SLOTS, lock: Optional[Any] = None,
+               poll_interval: float = POLL_INTERVAL) -> 'SharedAudioRing':
+        if slot_size <= 0 or slots <= 0:
+            raise ValueError(f"Invalid ring size: slot_size={slot_size} slots={slots}")
+        if poll_interval <= 0:
+            raise ValueError(f"Invalid ring poll interval: {poll_interval}")
+        size = _HEADER.size + (_LENGTH.size + slot_size) * slots
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, 0, 0, 0, 0, slot_size, slots, 0, poll_interval)
+        return cls(shm, owner=True, lock=lock)
+
+    @classmethod
+    def attach(cls, name: str, lock: Optional[Any] = None) -> 'SharedAudioRing':
+        return cls(shared_memory.SharedMemory(name=name), owner=False, lock=lock)
+
+    def _sync(self) -> ContextManager:
+        return self._lock if self._lock is not None else contextlib.nullcontext()
+
+    def _get(self, offset: int) -> int:
+        return struct.unpack_from('<Q', self._buf, offset)[0]
+
+    def _set(self, offset: int, value: int) -> None:
+        struct.pack_into('<Q', self._buf, offset, value)
+
+    def _load(self, offset: int) -> int:
+        """读取对方发布的游标"""
+        with self._sync():
+            return self._get(offset)
+
+    def _publish(self, offset: int, value: int) -> None:
+        """发布本方的游标：之前对槽位的读写在对方看到新游标前完成"""
+        with self._sync():
+            self._set(offset, value)
+
+    @property
+    def overruns(self) -> int:
+        return self._get(_OVERRUNS)
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self._get(_DROPPED)
+
+    def pending(self) -> int:
+        """已提交、尚未被读取方释放的槽位数"""
+        with self._sync():
+            return self._get(_WRITE) - self._get(_READ)
+
+    def _slot(self, index: int) -> int:
+        return self._data + (index % self.slots) * self.slot_size
+
+    def _commit(self, length: int) -> None:
+        write = self._get(_WRITE)
+        with self._sync():
+            # 先写数据和长度，最后推进游标，读取方看到游标时数据已完整
+            _LENGTH.pack_into(self._buf, self._lengths + (write % self.slots) * _LENGTH.size, length)
+            self._set(_WRITE, write + 1)
+
+    def write(self, data: bytes) -> bool:
+        """写入方：整块写入，空间不足时丢弃这一块并返回 False"""
+        if self._closed:
+            raise ValueError("Ring is closed for writing")
+        size = len(data)
+        if not size:
+            return True
+        write = self._get(_WRITE)
+        needed = -(-(self._fill + size) // self.slot_size)  # 包括正在填充的槽位
+        if write - self._load(_READ) + needed > self.slots:
+            self._set(_OVERRUNS, self.overruns + 1)
+            self._set(_DROPPED, self.dropped_bytes + size)
+            return False
+        view = memoryview(data).cast('B')
+        offset = 0
+        while offset < size:
+            start = self._slot(write) + self._fill
+            count = min(self.slot_size - self._fill, size - offset)
+            self._buf[start:start + count] = view[offset:offset + count]
+            offset += count
+            self._fill += count
+            if self._fill == self.slot_size:
+                self._commit(self.slot_size)
+                write += 1
+                self._fill = 0
+        return True
+
+    async def awrite(self, data: bytes) -> None:
+        """写入方：空间不足时等待读取方释放槽位，不计溢出；比整个缓冲区还大的块分多次写入"""
+        view = memoryview(data).cast('B')
+        while len(view):
+            # 空闲槽位包括正在填充的槽位，其中已填充的部分不能再写
+            room = (self.slots - self.pending()) * self.slot_size - self._fill
+            if room <= 0:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            count = min(room, len(view))
+            self.write(view[:count])
+            view = view[count:]
+
+    def close_writer(self) -> None:
+        """写入方：提交未满的槽位并标记结束"""
+        if self._closed:
+            return
+        if self._fill:
+            self._commit(self._fill)
+            self._fill = 0
+        self._closed = True
+        with self._sync():
+            struct.pack_into('<I', self._buf, _CLOSED, 1)
+
+    async def chunks(self) -> AsyncGenerator[memoryview, None]:
+        """读取方：按槽位产出音频，写入方结束且数据读完后停止
+
+        产出的 memoryview 直接指向共享内存，调用方取下一块时该槽位即被释放，之后不能再使用
+        """
+        read = self._get(_READ)
+        overruns = 0
+        while True:
+            if self._get(_OVERRUNS) != overruns:
+                overruns = self._get(_OVERRUNS)
+                logger.warning(f"Audio ring {self.name} overran {overruns} times, "
+                               f"{self.dropped_bytes} bytes dropped by the writer")
+            if read < self._load(_WRITE):
+                length = _LENGTH.unpack_from(self._buf, self._lengths + (read % self.slots) * _LENGTH.size)[0]
+                start = self._slot(read)
+                view = self._buf[start:start + length]
+                try:
+                    yield view
+                finally:
+                    view.release()
+                read += 1
+                self._publish(_READ, read)
+            elif self._closed_by_writer():
+                # 标记结束前的最后一个槽位已经提交，再确认一次游标
+                if read >= self._load(_WRITE):
+                    return
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    def _closed_by_writer(self) -> bool:
+        with self._sync():
+            return struct.unpack_from('<I', self._buf, _CLOSED)[0] == 1
+
+    def close(self) -> None:
+        """释放本进程的映射；创建方同时删除共享内存段"""
+        if self._buf is None:
+            return
+        self._buf = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有指向共享内存的 memoryview 未释放，映射在这些对象回收后释放
+            logger.warning(f"Audio ring {self.name} closed with views still alive")
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> 'SharedAudioRing':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
@@ -0,0 +1,105 @@
+"""
+增量转写结果
+服务端每条响应都带有完整的累积 result / utterances，长通话中逐条全量处理是 O(n²)。
+TranscriptAssembler 对比相邻两次结果，只输出变化：
+- committed：新确定（definite）的句子，确定后不再检查、不再输出
+- updated：新出现或内容有变化的未确定句子
+- retracted：上次存在、这次消失的未确定句子数（服务端重新分句时出现）
+未开启 show_utterances 时，把整段 text 当作一个未确定句子处理
+"""
+
+from typing import Any, AsyncGenerator, AsyncIterable, Dict, List, Optional, Tuple
+
+from sauc_websocket_demo import AsrResponse
+
+
+class TranscriptDelta:
+    def __init__(self, committed: List[Dict[str, Any]], updated: List[Tuple[int, Dict[str, Any]]],
+                 retracted: int, is_final: bool):
+        self.committed = committed  # 本次新确定的句子
+        self.updated = updated  # (句子序号, 句子)，序号从整个通话的第一句算起
+        self.retracted = retracted
+        self.is_final = is_final
+
+    def __bool__(self) -> bool:
+        return bool(self.committed or self.updated or self.retracted or self.is_final)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "committed": self.committed,
+            "updated": [{"index": index, **utterance} for index, utterance in self.updated],
+            "retracted": self.retracted,
+            "is_final": self.is_final
+        }
+
+
+class TranscriptAssembler:
+    def __init__(self):
+        self.committed: List[Dict[str, Any]] = []
+        self._committed_text: List[str] = []
+        # 上一条响应中的未确定句子，用于比对变化
+        self._tentative: List[Tuple[Any, Any, Any]] = []
+        self._tentative_utterances: List[Dict[str, Any]] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._committed_text) + "".join(u.get("text", "") for u in self._tentative_utterances)
+
+    @staticmethod
+    def _utterances(payload: Any) -> Optional[List[Dict[str, Any]]]:
+        result = payload.get("result") if isinstance(payload, dict) else None
+        if isinstance(result, list):  # 部分接口以列表形式返回 result
+            result = result[0] if result else None
+        if not isinstance(result, dict):
+            return None
+        utterances = result.get("utterances")
+        if utterances is None:
+            text = result.get("text")
+            return [{"text": text}] if text else []
+        return utterances
+
+    def _commit(self, utterance: Dict[str, Any]) -> None:
+        self.committed.append(utterance)
+        self._committed_text.append(utterance.get("text", ""))
+
+    def feed(self, payload: Any, is_final: bool = False) -> TranscriptDelta:
+        """处理一条响应的 payload，返回相对上一条的变化"""
+        utterances = self._utterances(payload)
+        if utterances is None:
+            return TranscriptDelta([], [], 0, is_final)
+
+        committed: List[Dict[str, Any]] = []
+        start = len(self.committed)
+        # 已确定的句子在累积结果中不会再变化，跳过这部分
+        pending = utterances[start:]
+        index = 0
+        while index < len(pending) and (is_final or pending[index].get("definite")):
+            self._commit(pending[index])
+            committed.append(pending[index])
+            index += 1
+
+        tentative = pending[index:]
+        keys = [(u.get("text"), u.get("start_time"), u.get("end_time")) for u in tentative]
+        # 新确定的句子移出未确定列表后，剩余部分与上次的对齐方式随之前移
+        previous = self._tentative[len(committed):]
+        updated = [
+            (start + index + i, utterance)
+            for i, (key, utterance) in enumerate(zip(keys, tentative))
+            if i >= len(previous) or previous[i] != key
+        ]
+        retracted = max(len(previous) - len(keys), 0)
+        self._tentative = keys
+        self._tentative_utterances = tentative
+        return TranscriptDelta(committed, updated, retracted, is_final)
+
+    async def follow(self, responses: AsyncIterable[AsrResponse]) -> AsyncGenerator[TranscriptDelta, None]:
+        """包装 recv_messages / execute 的输出，只产出有变化的增量
+
+        错误响应抛出 RuntimeError
+        """
+        async for response in responses:
+            if response.code != 0:
+                raise RuntimeError(f"ASR error response (code: {response.code}): {response.payload_msg}")
+            delta = self.feed(response.payload_msg, response.is_last_package)
+            if delta:
+                yield delta
@@ -0,0 +1,174 @@
+"""
+基于能量的语音活动检测（依赖 NumPy）
+- 把每个音频包切成短帧计算能量，任一帧超过阈值即视为语音包
+- 长时间静音（等待音、停顿）不发送，只在语音前后各保留一小段静音，避免切掉字头字尾
+- 记录跳过的区间，把服务端返回的时间戳换算回原始音频时间
+- 统计每个会话跳过的音频比例
+只处理 16bit 单声道 PCM
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+import numpy as np
+
+
+class EnergyVad:
+    """多个会话共享的检测参数，每个会话通过 session() 创建独立的状态"""
+
+    def __init__(self, threshold_db: float = -45.0, frame_ms: int = 20,
+                 hangover_ms: int = 400, preroll_ms: int = 200):
+        self.threshold_db = threshold_db  # 帧能量阈值（相对 16bit 满幅的 dBFS）
+        self.frame_ms = frame_ms
+        self.hangover_ms = hangover_ms  # 语音结束后继续发送的静音时长
+        self.preroll_ms = preroll_ms  # 语音开始前补发的静音时长
+        # 比较均方值即可，不必逐帧取对数
+        self._threshold_power = (32768.0 ** 2) * 10 ** (threshold_db / 10)
+        self.sessions = 0
+        self.total_ms = 0.0
+        self.skipped_ms = 0.0
+
+    @classmethod
+    def from_spec(cls, spec: str) -> 'EnergyVad':
+        """"energy" 或 "energy:<阈值dB>[:<拖尾ms>[:<前置ms>]]"，例如 energy:-40:600:200"""
+        parts = spec.split(":")
+        if parts[0] != "energy":
+            raise ValueError(f"Unknown VAD mode: {parts[0]}")
+        threshold_db = float(parts[1]) if len(parts) > 1 else -45.0
+        hangover_ms = int(parts[2]) if len(parts) > 2 else 400
+        preroll_ms = int(parts[3]) if len(parts) > 3 else 200
+        return cls(threshold_db, hangover_ms=hangover_ms, preroll_ms=preroll_ms)
+
+    def is_speech(self, segment: bytes, sample_rate: int) -> bool:
+        samples = np.frombuffer(segment, dtype='<i2', count=len(segment) // 2).astype(np.float32)
+        frame = max(sample_rate * self.frame_ms // 1000, 1)
+        usable = len(samples) - len(samples) % frame
+        if usable:
+            power = np.square(samples[:usable]).reshape(-1, frame).mean(axis=1)
+        else:
+            power = np.square(samples).mean(keepdims=True) if len(samples) else np.zeros(1, dtype=np.float32)
+        return bool((power > self._threshold_power).any())
+
+    def session(self, bytes_per_second: int) -> 'VadSession':
+        self.sessions += 1
+        return VadSession(self, bytes_per_second)
+
+    @property
+    def skipped_ratio(self) -> float:
+        return self.skipped_ms / self.total_ms if self.total_ms else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "total_ms": round(self.total_ms),
+            "skipped_ms": round(self.skipped_ms),
+            "skipped_ratio": self.skipped_ratio,
+        }
+
+
+class VadSession:
+    """单个会话的静音过滤状态和时间轴映射，由 EnergyVad.session() 创建"""
+
+    def __init__(self, vad: EnergyVad, bytes_per_second: int):
+        self.vad = vad
+        self.bytes_per_second = bytes_per_second
+        self.sample_rate = bytes_per_second // 2
+        self.total_ms = 0.0
+        self.sent_ms = 0.0
+        self.skipped_ms = 0.0
+        self._since_speech_ms = float("inf")  # 距上一个语音包结束的时长
+        self._speech_seen = False
+        # 被跳过、尚可作为前置静音补发的包：(原始起始时间, 数据)
+        self._preroll: Deque[Tuple[float, bytes]] = deque()
+        self._preroll_ms = 0.0
+        # 时间轴断点：发送时间轴上的位置 -> 原始时间轴上的位置，每次跳过静音后新增一个
+        self._sent_marks: List[float] = [0.0]
+        self._orig_marks: List[float] = [0.0]
+
+    def _duration_ms(self, segment: bytes) -> float:
+        return len(segment) * 1000 / self.bytes_per_second
+
+    def _mark_sent(self, orig_start: float, duration: float) -> None:
+        expected = self._orig_marks[-1] + (self.sent_ms - self._sent_marks[-1])
+        if orig_start != expected:
+            self._sent_marks.append(self.sent_ms)
+            self._orig_marks.append(orig_start)
+        self.sent_ms += duration
+
+    def process(self, segment: memoryview, is_last: bool) -> List[Tuple[memoryview, bool]]:
+        """返回本次需要发送的包，可能为空；语音开始时会先带出前置静音
+
+        第一包（可能带WAV头）和最后一包总是发送
+        """
+        orig_start = self.total_ms
+        duration = self._duration_ms(segment)
+        self.total_ms += duration
+        self.vad.total_ms += duration
+
+        speech = self.vad.is_speech(segment, self.sample_rate)
+        first = orig_start == 0
+        if speech:
+            self._since_speech_ms = 0.0
+        keep = speech or first or is_last or self._since_speech_ms < self.vad.hangover_ms
+        if not speech:
+            self._since_speech_ms += duration
+
+        if not keep:
+            # 分段缓冲区可能被来源复用，保留的前置静音需要拷贝
+            self._preroll.append((orig_start, bytes(segment)))
+            self._preroll_ms += duration
+            while self._preroll and self._preroll_ms - self._duration_ms(self._preroll[0][1]) >= self.vad.preroll_ms:
+                dropped_start, dropped = self._preroll.popleft()
+                dropped_ms = self._duration_ms(dropped)
+                self._preroll_ms -= dropped_ms
+                self.skipped_ms += dropped_ms
+                self.vad.skipped_ms += dropped_ms
+            return []
+
+        outgoing: List[Tuple[memoryview, bool]] = []
+        if speech:
+            for preroll_start, data in self._preroll:
+                self._mark_sent(preroll_start, self._duration_ms(data))
+                outgoing.append((memoryview(data), False))
+        else:
+            # 非语音包（拖尾或最后一包）发出时，缓冲中的静音不再补发
+            for _, data in self._preroll:
+                self.skipped_ms += self._duration_ms(data)
+                self.vad.skipped_ms += self._duration_ms(data)
+        self._preroll.clear()
+        self._preroll_ms = 0.0
+        self._mark_sent(orig_start, duration)
+        outgoing.append((segment, is_last))
+        return outgoing
+
+    @property
+    def skipped_ratio(self) -> float:
+        return self.skipped_ms / self.total_ms if self.total_ms else 0.0
+
+    def to_original(self, ms: float, is_end: bool = False) -> float:
+        """把服务端时间（发送时间轴）换算为原始音频时间
+
+        is_end=True 时，恰好落在断点上的时间归入前一段，避免句尾跳到静音之后
+        """
+        index = (bisect_left if is_end else bisect_right)(self._sent_marks, ms) - 1
+        index = max(index, 0)
+        return self._orig_marks[index] + (ms - self._sent_marks[index])
+
+    def remap_result(self, payload: Any, skip: int = 0) -> None:
+        """就地修改响应中 utterances 及其 words 的 start_time / end_time，前 skip 个句子保持不变"""
+        if len(self._sent_marks) == 1 or not isinstance(payload, dict):
+            return
+        result = payload.get("result")
+        if not isinstance(result, dict):
+            return
+        for utterance in (result.get("utterances") or [])[skip:]:
+            self._remap_span(utterance)
+            for word in utterance.get("words") or []:
+                self._remap_span(word)
+
+    def _remap_span(self, item: Dict[str, Any]) -> None:
+        if isinstance(item.get("start_time"), (int, float)):
+            item["start_time"] = round(self.to_original(item["start_time"]))
+        if isinstance(item.get("end_time"), (int, float)):
+            item["end_time"] = round(self.to_original(item["end_time"], is_end=True))
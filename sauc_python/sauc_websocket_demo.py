@@ -3,11 +3,28 @@ import aiohttp
 import json
 import struct
 import gzip
+import zlib
 import uuid
 import logging
-import os
 import subprocess
-from typing import Optional, List, Dict, Any, Tuple, AsyncGenerator
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Optional, List, Dict, Any, Deque, Tuple, AsyncGenerator, AsyncIterable, Iterator, Union, BinaryIO
+
+from sauc_metrics import LatencyMetrics, SessionLatency
+from sauc_resume import ResumeState
+from sauc_scheduler import TickScheduler
+
+try:
+    from sauc_audio import PcmNormalizer, normalize_stream, read_wav_format
+except ImportError:  # 未安装 NumPy 时，格式不符的WAV交给 ffmpeg 转换
+    PcmNormalizer = None
+
+try:
+    from sauc_vad import EnergyVad, VadSession
+except ImportError:  # 未安装 NumPy 时不能启用静音检测
+    EnergyVad = VadSession = None
 
 # 配置日志
 logging.basicConfig(
@@ -43,6 +60,7 @@ class SerializationType:
     JSON = 0b0001
 
 class CompressionType:
+    NO_COMPRESSION = 0b0000
     GZIP = 0b0001
 
 
@@ -79,22 +97,20 @@ class CommonUtils:
             return False
         return data[:4] == b'RIFF' and data[8:12] == b'WAVE'
 
+    @staticmethod
+    def ffmpeg_wav_command(audio_path: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> List[str]:
+        return [
+            "ffmpeg", "-nostdin", "-v", "error", "-y", "-i", audio_path,
+            "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate),
+            "-f", "wav", "-"
+        ]
+
     @staticmethod
     def convert_wav_with_path(audio_path: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+        # 只读取原始文件，不做删除
         try:
-            cmd = [
-                "ffmpeg", "-v", "quiet", "-y", "-i", audio_path,
-                "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate),
-                "-f", "wav", "-"
-            ]
+            cmd = CommonUtils.ffmpeg_wav_command(audio_path, sample_rate)
             result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            # 尝试删除原始文件
-            try:
-                os.remove(audio_path)
-            except OSError as e:
-                logger.warning(f"Failed to remove original file: {e}")
-                
             return result.stdout
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg conversion failed: {e.stderr.decode()}")
@@ -122,7 +138,7 @@ class CommonUtils:
         
         # 查找data子块
         pos = 36
-        while pos < len(data) - 8:
+        while pos <= len(data) - 8:
             subchunk_id = data[pos:pos+4]
             subchunk_size = struct.unpack('<I', data[pos+4:pos+8])[0]
             if subchunk_id == b'data':
@@ -134,10 +150,574 @@ class CommonUtils:
                     subchunk_size // (num_channels * (bits_per_sample // 8)),
                     wave_data
                 )
-            pos += 8 + subchunk_size
+            pos += 8 + subchunk_size + (subchunk_size & 1)
             
         raise ValueError("Invalid WAV file: no data subchunk found")
 
+    @staticmethod
+    def read_wav_header(file: BinaryIO) -> bytes:
+        """从文件开头逐个子块读到 data 子块头为止，返回这段原始字节，不受元数据子块大小限制
+
+        不是 RIFF/WAVE 文件时只返回开头的 12 个字节
+        """
+        header = file.read(12)
+        if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return header
+        while True:
+            chunk_header = file.read(8)
+            header += chunk_header
+            if len(chunk_header) < 8 or chunk_header[:4] == b'data':
+                return header
+            chunk_size = struct.unpack('<I', chunk_header[4:])[0]
+            header += file.read(chunk_size + (chunk_size & 1))  # 子块按偶数字节对齐
+
+    @staticmethod
+    def wav_data_offset(data: bytes) -> int:
+        """data子块中音频数据的起始位置，即WAV头的长度"""
+        pos = 12
+        while pos <= len(data) - 8:
+            subchunk_size = struct.unpack('<I', data[pos+4:pos+8])[0]
+            if data[pos:pos+4] == b'data':
+                return pos + 8
+            pos += 8 + subchunk_size + (subchunk_size & 1)
+        raise ValueError("Invalid WAV file: no data subchunk found")
+
+class AudioFormat:
+    """完整客户端请求中声明的音频格式"""
+
+    def __init__(self, format: str = "wav", codec: str = "raw", rate: int = DEFAULT_SAMPLE_RATE,
+                 bits: int = 16, channel: int = 1):
+        self.format = format
+        self.codec = codec
+        self.rate = rate
+        self.bits = bits
+        self.channel = channel
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.rate * self.bits // 8 * self.channel
+
+    def segment_size(self, segment_duration: int) -> int:
+        return self.bytes_per_second * segment_duration // 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": self.format,
+            "codec": self.codec,
+            "rate": self.rate,
+            "bits": self.bits,
+            "channel": self.channel
+        }
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, AudioFormat) and self.to_dict() == other.to_dict()
+
+    def same_pcm_params(self, rate: int, bits: int, channel: int) -> bool:
+        return (self.rate, self.bits, self.channel) == (rate, bits, channel)
+
+    def accepts(self, other: 'AudioFormat') -> bool:
+        """按本格式握手的会话能否直接发送 other：格式相同，或都是参数一致的未编码 PCM（WAV 与裸 PCM 视为一致）"""
+        return self == other or (self.codec == other.codec == "raw" and
+                                 self.same_pcm_params(other.rate, other.bits, other.channel))
+
+    def __repr__(self) -> str:
+        return f"AudioFormat({self.format}, {self.rate}Hz, {self.bits}bit, {self.channel}ch)"
+
+WAV_16K_MONO = AudioFormat()
+PCM_16K_MONO = AudioFormat("pcm")
+# 电话网关送来的 8kHz G.711 窄带音频，发送前解码并上采样为 PCM_16K_MONO
+MULAW_8K_MONO = AudioFormat("pcm", "mulaw", 8000, 8)
+ALAW_8K_MONO = AudioFormat("pcm", "alaw", 8000, 8)
+G711_CODECS = ("mulaw", "alaw")
+
+class AudioSource:
+    """音频来源：header 是用于解析格式的WAV头，segments() 按段惰性产出 (memoryview, is_last)
+
+    audio_format 为 None 时按 header 中的WAV参数分段，并按默认的WAV格式声明
+    """
+
+    header: bytes = b''
+    audio_format: Optional[AudioFormat] = None
+
+    def segments(self, segment_size: int) -> Iterator[Tuple[memoryview, bool]]:
+        raise NotImplementedError
+
+    async def asegments(self, segment_size: int) -> AsyncGenerator[Tuple[memoryview, bool], None]:
+        """异步版本的 segments()，默认直接包装同步实现"""
+        for item in self.segments(segment_size):
+            yield item
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        """在事件循环中关闭，需要等待子进程等资源退出的来源重写此方法"""
+        self.close()
+
+    def __enter__(self) -> 'AudioSource':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+class BytesAudioSource(AudioSource):
+    """内存中的完整音频，按段产出对原数据的切片视图，不拷贝"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.header = content
+
+    def segments(self, segment_size: int) -> Iterator[Tuple[memoryview, bool]]:
+        if segment_size <= 0:
+            return
+        view = memoryview(self.content)
+        total = len(view)
+        for start in range(0, total, segment_size):
+            end = start + segment_size
+            yield view[start:end], end >= total
+
+class StreamAudioSource(AudioSource):
+    """实时音频流：把任意大小的到达块重新切分为固定分段
+
+    整段立即发出，不等待下一块；流结束时把剩余数据（可能为空）作为最后一包发出。
+    完整落在一个到达块内的分段直接切片，不拷贝；只有跨块的分段需要拼接
+    """
+
+    def __init__(self, stream: AsyncIterable[bytes], audio_format: AudioFormat = PCM_16K_MONO):
+        self.stream = stream
+        self.audio_format = audio_format
+
+    async def asegments(self, segment_size: int) -> AsyncGenerator[Tuple[memoryview, bool], None]:
+        if segment_size <= 0:
+            return
+        pending = bytearray()
+        async for chunk in self.stream:
+            view = memoryview(chunk)
+            offset = 0
+            if pending:
+                offset = min(segment_size - len(pending), len(view))
+                pending += view[:offset]
+                if len(pending) < segment_size:
+                    continue
+                yield memoryview(bytes(pending)), False
+                pending.clear()
+            while len(view) - offset >= segment_size:
+                yield view[offset:offset + segment_size], False
+                offset += segment_size
+            pending += view[offset:]
+        yield memoryview(bytes(pending)), True
+
+class WavFileSource(AudioSource):
+    """边读边发的WAV文件，内存占用为两个分段大小，与文件长度无关"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self.header = CommonUtils.read_wav_header(self._file)
+
+    def segments(self, segment_size: int) -> Iterator[Tuple[memoryview, bool]]:
+        if segment_size <= 0:
+            return
+        self._file.seek(0)
+        # 两块缓冲区交替使用：一块交给调用方，另一块预读下一段，以便给最后一包打标记
+        views = [memoryview(bytearray(segment_size)), memoryview(bytearray(segment_size))]
+        current = 0
+        size = self._file.readinto(views[current])
+        while size:
+            ahead = 1 - current
+            ahead_size = self._file.readinto(views[ahead])
+            yield views[current][:size], not ahead_size
+            current, size = ahead, ahead_size
+
+    def close(self) -> None:
+        self._file.close()
+
+class NormalizedWavSource(StreamAudioSource):
+    """采样率、声道或位深与声明格式不一致的PCM WAV：在进程内边读边转为16kHz/16bit/单声道PCM，不启动ffmpeg"""
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self.header = CommonUtils.read_wav_header(self._file)
+        try:
+            format_tag, channels, sample_width, sample_rate, self._data_offset, self._data_size = \
+                read_wav_format(self.header)
+            normalizer = PcmNormalizer(sample_rate, channels, sample_width, format_tag, DEFAULT_SAMPLE_RATE)
+        except Exception:
+            self._file.close()
+            raise
+        super().__init__(normalize_stream(self._read_data(), normalizer), PCM_16K_MONO)
+
+    async def _read_data(self) -> AsyncGenerator[bytes, None]:
+        self._file.seek(self._data_offset)
+        # 流式写出的WAV可能把 data 大小记为 0 或 0xFFFFFFFF，此时读到文件末尾
+        remaining = self._data_size if self._data_size not in (0, 0xFFFFFFFF) else None
+        while remaining is None or remaining > 0:
+            chunk = self._file.read(self.READ_SIZE if remaining is None else min(self.READ_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self._file.close()
+
+class FfmpegAudioSource(AudioSource):
+    """异步ffmpeg转码管道：转出一段就发送一段，不阻塞事件循环，也不改动原始文件"""
+
+    STDERR_TAIL = 8192  # 转码失败时报告的 stderr 末尾字节数
+
+    def __init__(self, file_path: str, process: asyncio.subprocess.Process):
+        self.file_path = file_path
+        self._process = process
+        self._head = b''  # 已读出但尚未发送的WAV头
+        # stderr 管道写满时 ffmpeg 会阻塞，需要边转码边读取，只保留末尾一段
+        self._stderr = bytearray()
+        self._stderr_reader = asyncio.create_task(self._drain_stderr())
+
+    @classmethod
+    async def start(cls, file_path: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> 'FfmpegAudioSource':
+        process = await asyncio.create_subprocess_exec(
+            *CommonUtils.ffmpeg_wav_command(file_path, sample_rate),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        source = cls(file_path, process)
+        try:
+            await source._read_header()
+        except Exception:
+            await source.aclose()
+            raise
+        return source
+
+    async def _drain_stderr(self) -> None:
+        while True:
+            chunk = await self._process.stderr.read(4096)
+            if not chunk:
+                return
+            self._stderr += chunk
+            del self._stderr[:-self.STDERR_TAIL]
+
+    async def _read_header(self) -> None:
+        # 读到data子块头为止，用于计算分段大小，这部分数据随第一包一起发出
+        stdout = self._process.stdout
+        try:
+            header = await stdout.readexactly(12)
+            while True:
+                chunk_header = await stdout.readexactly(8)
+                header += chunk_header
+                if chunk_header[:4] == b'data':
+                    break
+                header += await stdout.readexactly(struct.unpack('<I', chunk_header[4:])[0])
+        except asyncio.IncompleteReadError:
+            await self._check_exit()
+            raise RuntimeError("Audio conversion failed: ffmpeg produced no WAV header")
+        self.header = self._head = header
+
+    async def _read_segment(self, segment_size: int) -> bytes:
+        head, self._head = self._head, b''
+        try:
+            return head + await self._process.stdout.readexactly(segment_size - len(head))
+        except asyncio.IncompleteReadError as e:
+            return head + e.partial
+
+    async def _check_exit(self) -> None:
+        returncode = await self._process.wait()
+        if returncode != 0:
+            await self._stderr_reader
+            stderr = self._stderr.decode(errors='replace')
+            logger.error(f"FFmpeg conversion failed: {stderr}")
+            raise RuntimeError(f"Audio conversion failed: {stderr}")
+
+    async def asegments(self, segment_size: int) -> AsyncGenerator[Tuple[memoryview, bool], None]:
+        if segment_size <= 0:
+            return
+        current = await self._read_segment(segment_size)
+        while current:
+            # 预读下一段以判断当前段是否为最后一包
+            ahead = await self._read_segment(segment_size)
+            if not ahead:
+                await self._check_exit()
+            yield memoryview(current), not ahead
+            current = ahead
+
+    def close(self) -> None:
+        """同步关闭只能结束进程，不等待退出；在事件循环中应使用 aclose()"""
+        if self._process.returncode is None:
+            self._process.kill()
+
+    async def aclose(self) -> None:
+        self.close()
+        # 丢弃 stdout 中未读的数据：读取因缓冲区满而暂停时管道不会断开，wait() 不会返回
+        await self._process.stdout.read()
+        # 等待进程退出并回收，避免留下僵尸进程
+        await self._process.wait()
+        await self._stderr_reader
+
+class PayloadCompressor:
+    """payload压缩策略：none / gzip（指定压缩级别）/ 超过阈值才gzip，每个客户端复用一个实例"""
+
+    NONE = "none"
+    GZIP = "gzip"
+
+    def __init__(self, mode: str = GZIP, level: int = 9, threshold: int = 0):
+        if mode not in (self.NONE, self.GZIP):
+            raise ValueError(f"Unknown compression mode: {mode}")
+        if not 0 <= level <= 9:
+            raise ValueError(f"Invalid gzip level: {level}")
+        self.mode = mode
+        self.level = level
+        self.threshold = threshold
+
+    @classmethod
+    def from_spec(cls, spec: str) -> 'PayloadCompressor':
+        """解析 "none"、"gzip"、"gzip:<level>"、"gzip:<level>:<threshold>" 形式的配置"""
+        parts = spec.split(":")
+        if parts[0] == cls.NONE and len(parts) == 1:
+            return cls(cls.NONE)
+        if parts[0] == cls.GZIP and len(parts) <= 3:
+            level = int(parts[1]) if len(parts) > 1 else 9
+            threshold = int(parts[2]) if len(parts) > 2 else 0
+            return cls(cls.GZIP, level, threshold)
+        raise ValueError(f"Invalid compression spec: {spec}")
+
+    def compress(self, data: bytes) -> Tuple[int, bytes]:
+        """返回 (compression_type, payload)，payload可能是未拷贝的原始数据"""
+        if self.mode == self.NONE or len(data) < self.threshold:
+            return CompressionType.NO_COMPRESSION, data
+        # wbits=31 直接生成gzip格式，省去gzip模块的Python层封装
+        return CompressionType.GZIP, zlib.compress(data, self.level, 31)
+
+    def __repr__(self) -> str:
+        if self.mode == self.NONE:
+            return "PayloadCompressor(none)"
+        return f"PayloadCompressor(gzip, level={self.level}, threshold={self.threshold})"
+
+DEFAULT_COMPRESSOR = PayloadCompressor()
+
+class PacingPolicy:
+    """发送节奏：realtime 按音频时长实时发送 / x<N> 以N倍速发送 / max 不等待，尽服务端所能接收"""
+
+    REALTIME = "realtime"
+    MAX = "max"
+
+    def __init__(self, speed: float = 1.0):
+        # speed为0表示不限速
+        if speed < 0:
+            raise ValueError(f"Invalid pacing speed: {speed}")
+        self.speed = speed
+
+    @classmethod
+    def from_spec(cls, spec: str) -> 'PacingPolicy':
+        if spec == cls.REALTIME:
+            return cls(1.0)
+        if spec == cls.MAX:
+            return cls(0.0)
+        try:
+            speed = float(spec.strip("xX"))
+        except ValueError:
+            raise ValueError(f"Invalid pacing spec: {spec}")
+        if speed <= 0:
+            raise ValueError(f"Invalid pacing spec: {spec}")
+        return cls(speed)
+
+    def interval(self, segment_duration: int) -> float:
+        """相邻两包的发送间隔（秒），0表示不等待"""
+        if not self.speed:
+            return 0.0
+        return segment_duration / 1000 / self.speed
+
+    def __repr__(self) -> str:
+        if not self.speed:
+            return "PacingPolicy(max)"
+        return f"PacingPolicy(x{self.speed:g})"
+
+REALTIME_PACING = PacingPolicy()
+
+class CodecOffload:
+    """大payload的压缩、解压和JSON解析放到有界线程池执行，避免阻塞事件循环上的其他会话
+
+    阈值按解码后（未压缩）的大小判断；gzip payload 从尾部的长度字段读取解压后大小，不必先解压。
+    zlib 执行时释放 GIL；JSON 解析虽持有 GIL，但解释器按切换间隔让出，事件循环不会被整段阻塞。
+    同一会话内逐条等待，结果顺序与收发顺序一致。多个客户端可共用一个实例
+    """
+
+    OFF = "off"
+    THREAD = "thread"
+
+    def __init__(self, threshold: int = 32 * 1024, max_workers: int = 4):
+        if threshold < 0:
+            raise ValueError(f"Invalid offload threshold: {threshold}")
+        if max_workers <= 0:
+            raise ValueError(f"Invalid offload worker count: {max_workers}")
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.offloaded = 0
+
+    @classmethod
+    def from_spec(cls, spec: str) -> Optional['CodecOffload']:
+        """解析 "off"、"thread"、"thread:<阈值字节数>"、"thread:<阈值字节数>:<线程数>"，off 返回 None"""
+        parts = spec.split(":")
+        if parts[0] == cls.OFF and len(parts) == 1:
+            return None
+        if parts[0] == cls.THREAD and len(parts) <= 3:
+            threshold = int(parts[1]) if len(parts) > 1 else 32 * 1024
+            max_workers = int(parts[2]) if len(parts) > 2 else 4
+            return cls(threshold, max_workers)
+        raise ValueError(f"Invalid offload spec: {spec}")
+
+    @staticmethod
+    def decoded_size(payload: bytes, message_compression: int) -> int:
+        if message_compression == CompressionType.GZIP and len(payload) >= 18:
+            # gzip 尾部 ISIZE：原始数据长度对 2^32 取模
+            return struct.unpack_from('<I', payload, len(payload) - 4)[0]
+        return len(payload)
+
+    def applies(self, size: int) -> bool:
+        return size >= self.threshold
+
+    async def run(self, func, *args) -> Any:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="sauc-codec")
+        self.offloaded += 1
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def __repr__(self) -> str:
+        return f"CodecOffload(threshold={self.threshold}, max_workers={self.max_workers})"
+
+class SendQueuePolicy:
+    """发送队列：音频来源与 send_bytes 之间的有界队列，满时的处理方式
+
+    block 暂停读取音频直到有空位 / coalesce 同样等待，但发送时把排队的多个分段合并为一帧，
+    减少协议头和gzip调用 / drop 丢弃新分段并计数（最后一包总是等待发送）
+    """
+
+    BLOCK = "block"
+    COALESCE = "coalesce"
+    DROP = "drop"
+    DEFAULT_MAX_COALESCE = 5
+
+    def __init__(self, mode: str = BLOCK, max_pending: int = 16, max_coalesce: Optional[int] = None):
+        if mode not in (self.BLOCK, self.COALESCE, self.DROP):
+            raise ValueError(f"Unknown send queue mode: {mode}")
+        if max_coalesce is None:
+            max_coalesce = min(self.DEFAULT_MAX_COALESCE, max_pending)
+        if max_pending <= 0 or max_coalesce <= 0:
+            raise ValueError(f"Invalid send queue size: max_pending={max_pending} max_coalesce={max_coalesce}")
+        if max_coalesce > max_pending:
+            # 一帧只能合并已在队列中的分段，超过 max_pending 的部分永远用不上
+            raise ValueError(f"max_coalesce ({max_coalesce}) cannot exceed max_pending ({max_pending})")
+        self.mode = mode
+        self.max_pending = max_pending  # 排队等待发送的分段数上限
+        self.max_coalesce = max_coalesce  # coalesce 模式下一帧最多合并的分段数，不超过 max_pending
+
+    @classmethod
+    def from_spec(cls, spec: str) -> 'SendQueuePolicy':
+        """解析 "block[:N]"、"drop[:N]"、"coalesce[:N[:K]]"，N 为队列长度，K 为每帧最多合并的分段数（K <= N）"""
+        parts = spec.split(":")
+        if parts[0] in (cls.BLOCK, cls.DROP) and len(parts) <= 2:
+            return cls(parts[0], int(parts[1]) if len(parts) > 1 else 16)
+        if parts[0] == cls.COALESCE and len(parts) <= 3:
+            max_pending = int(parts[1]) if len(parts) > 1 else 16
+            max_coalesce = int(parts[2]) if len(parts) > 2 else None
+            return cls(cls.COALESCE, max_pending, max_coalesce)
+        raise ValueError(f"Invalid send queue spec: {spec}")
+
+    def __repr__(self) -> str:
+        if self.mode == self.COALESCE:
+            return f"SendQueuePolicy(coalesce, max_pending={self.max_pending}, max_coalesce={self.max_coalesce})"
+        return f"SendQueuePolicy({self.mode}, max_pending={self.max_pending})"
+
+class SendQueue:
+    """单个会话的发送队列，由 send_messages 在设置了 SendQueuePolicy 时创建；单生产者单消费者"""
+
+    def __init__(self, policy: SendQueuePolicy, latency: Optional[SessionLatency] = None):
+        self.policy = policy
+        self.latency = latency
+        self._items: Deque[Tuple[bytes, bool]] = deque()
+        self._space = asyncio.Event()
+        self._available = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+        self.coalesced_segments = 0  # 被合并进前一个分段、没有单独成帧的分段数
+        self.dropped_segments = 0
+        self.dropped_bytes = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def fail(self, error: BaseException) -> None:
+        """发送方出错：唤醒等待中的生产者，之后的 put/get 抛出该异常"""
+        self._error = error
+        self._space.set()
+        self._available.set()
+
+    async def put(self, packet: bytes, is_last: bool) -> bool:
+        """入队一个分段，drop 模式下队列已满时丢弃并返回 False"""
+        if self._error is not None:
+            raise self._error
+        if self.latency is not None:
+            self.latency.on_enqueue(len(self._items))
+        if len(self._items) >= self.policy.max_pending:
+            if self.policy.mode == SendQueuePolicy.DROP and not is_last:
+                self.dropped_segments += 1
+                self.dropped_bytes += len(packet)
+                if self.latency is not None:
+                    self.latency.on_drop(len(packet))
+                return False
+            started = time.monotonic()
+            while len(self._items) >= self.policy.max_pending:
+                self._space.clear()
+                await self._space.wait()
+                if self._error is not None:
+                    raise self._error
+            self.blocked_seconds += time.monotonic() - started
+        # 来源可能复用分段缓冲区，入队时拷贝
+        self._items.append((bytes(packet), is_last))
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._available.set()
+        return True
+
+    async def get(self) -> Tuple[bytes, bool]:
+        while not self._items:
+            if self._error is not None:
+                raise self._error
+            self._available.clear()
+            await self._available.wait()
+        data, is_last = self._items.popleft()
+        if self.policy.mode == SendQueuePolicy.COALESCE and self._items and not is_last:
+            parts = [data]
+            while self._items and len(parts) < self.policy.max_coalesce and not is_last:
+                data, is_last = self._items.popleft()
+                parts.append(data)
+            data = b''.join(parts)
+            self.coalesced_segments += len(parts) - 1
+            if self.latency is not None:
+                self.latency.on_coalesce(len(parts))
+        self._space.set()
+        return data, is_last
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "policy": repr(self.policy),
+            "max_depth": self.max_depth,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "coalesced_segments": self.coalesced_segments,
+            "dropped_segments": self.dropped_segments,
+            "dropped_bytes": self.dropped_bytes,
+        }
+
 class AsrRequestHeader:
     def __init__(self):
         self.message_type = MessageType.CLIENT_FULL_REQUEST
@@ -192,7 +772,9 @@ class RequestBuilder:
         }
 
     @staticmethod
-    def new_full_client_request(seq: int) -> bytes:  # 添加seq参数
+    def new_full_client_request(seq: int,  # 添加seq参数
+                                compressor: PayloadCompressor = DEFAULT_COMPRESSOR,
+                                audio_format: AudioFormat = WAV_16K_MONO) -> bytes:
         header = AsrRequestHeader.default_header() \
             .with_message_type_specific_flags(MessageTypeSpecificFlags.POS_SEQUENCE)
         
@@ -200,13 +782,7 @@ class RequestBuilder:
             "user": {
                 "uid": "demo_uid"
             },
-            "audio": {
-                "format": "wav",
-                "codec": "raw",
-                "rate": 16000,
-                "bits": 16,
-                "channel": 1
-            },
+            "audio": audio_format.to_dict(),
             "request": {
                 "model_name": "bigmodel",
                 "enable_itn": True,
@@ -218,7 +794,8 @@ class RequestBuilder:
         }
         
         payload_bytes = json.dumps(payload).encode('utf-8')
-        compressed_payload = CommonUtils.gzip_compress(payload_bytes)
+        compression_type, compressed_payload = compressor.compress(payload_bytes)
+        header.with_compression_type(compression_type)
         payload_size = len(compressed_payload)
         
         request = bytearray()
@@ -230,7 +807,8 @@ class RequestBuilder:
         return bytes(request)
 
     @staticmethod
-    def new_audio_only_request(seq: int, segment: bytes, is_last: bool = False) -> bytes:
+    def new_audio_only_request(seq: int, segment: bytes, is_last: bool = False,
+                               compressor: PayloadCompressor = DEFAULT_COMPRESSOR) -> bytes:
         header = AsrRequestHeader.default_header()
         if is_last:  # 最后一个包特殊处理
             header.with_message_type_specific_flags(MessageTypeSpecificFlags.NEG_WITH_SEQUENCE)
@@ -239,24 +817,124 @@ class RequestBuilder:
             header.with_message_type_specific_flags(MessageTypeSpecificFlags.POS_SEQUENCE)
         header.with_message_type(MessageType.CLIENT_AUDIO_ONLY_REQUEST)
         
+        compression_type, compressed_segment = compressor.compress(segment)
+        header.with_compression_type(compression_type)
+        
         request = bytearray()
         request.extend(header.to_bytes())
         request.extend(struct.pack('>i', seq))
-        
-        compressed_segment = CommonUtils.gzip_compress(segment)
         request.extend(struct.pack('>I', len(compressed_segment)))
         request.extend(compressed_segment)
         
         return bytes(request)
 
+class AudioFrameEncoder:
+    """音频包编码器：在复用的缓冲区中原地写入 header、seq、size 和 payload，避免每包多次拷贝"""
+
+    # 4字节协议头 + 4字节seq + 4字节payload size
+    FRAME_HEADER = struct.Struct('>BBBBiI')
+
+    def __init__(self, compressor: PayloadCompressor = DEFAULT_COMPRESSOR, initial_capacity: int = 0):
+        self.compressor = compressor
+        self._buffer = bytearray(self.FRAME_HEADER.size + initial_capacity)
+        self._view = memoryview(self._buffer)
+
+    def _ensure_capacity(self, frame_size: int) -> None:
+        if frame_size <= len(self._buffer):
+            return
+        # 按需扩容，之后的包继续复用同一块缓冲区
+        self._buffer = bytearray(frame_size)
+        self._view = memoryview(self._buffer)
+
+    @staticmethod
+    def sequence_flags(seq: int, is_last: bool) -> Tuple[int, int]:
+        """返回写入协议头的 (seq, flags)"""
+        if is_last:  # 最后一个包特殊处理
+            return -seq, MessageTypeSpecificFlags.NEG_WITH_SEQUENCE  # 设为负值
+        return seq, MessageTypeSpecificFlags.POS_SEQUENCE
+
+    def encode(self, seq: int, segment: bytes, is_last: bool = False) -> memoryview:
+        """编码一个音频包。返回的 memoryview 指向内部缓冲区，仅在下一次 encode 之前有效"""
+        seq, flags = self.sequence_flags(seq, is_last)
+        compression_type, payload = self.compressor.compress(segment)
+        return self.pack(seq, flags, payload, compression_type)
+
+    async def encode_offloaded(self, seq: int, segment: bytes, is_last: bool,
+                               offload: CodecOffload) -> memoryview:
+        """与 encode() 相同，segment 达到阈值且需要压缩时在线程池中压缩"""
+        if self.compressor.mode == PayloadCompressor.NONE or not offload.applies(len(segment)):
+            return self.encode(seq, segment, is_last)
+        compression_type, payload = await offload.run(self.compressor.compress, segment)
+        seq, flags = self.sequence_flags(seq, is_last)
+        return self.pack(seq, flags, payload, compression_type)
+
+    def pack(self, seq: int, flags: int, payload: bytes,
+             compression_type: int = CompressionType.GZIP) -> memoryview:
+        """把已压缩的 payload 连同协议头写入缓冲区"""
+        payload_size = len(payload)
+        header_size = self.FRAME_HEADER.size
+        frame_size = header_size + payload_size
+        self._ensure_capacity(frame_size)
+
+        self.FRAME_HEADER.pack_into(
+            self._buffer, 0,
+            (ProtocolVersion.V1 << 4) | 1,
+            (MessageType.CLIENT_AUDIO_ONLY_REQUEST << 4) | flags,
+            (SerializationType.JSON << 4) | compression_type,
+            0x00,
+            seq,
+            payload_size
+        )
+        self._view[header_size:frame_size] = payload
+        return self._view[:frame_size]
+
 class AsrResponse:
+    __slots__ = (
+        'code', 'event', 'is_last_package', 'payload_sequence', 'payload_size',
+        '_payload_msg', '_raw_payload', '_serialization_method', '_message_compression'
+    )
+
     def __init__(self):
         self.code = 0
         self.event = 0
         self.is_last_package = False
         self.payload_sequence = 0
         self.payload_size = 0
-        self.payload_msg = None
+        self._payload_msg = None
+        # 未解码的原始payload，首次访问payload_msg时才解压和解析
+        self._raw_payload = None
+        self._serialization_method = SerializationType.NO_SERIALIZATION
+        self._message_compression = CompressionType.NO_COMPRESSION
+
+    def set_raw_payload(self, payload: bytes, serialization_method: int, message_compression: int) -> None:
+        self._raw_payload = payload
+        self._serialization_method = serialization_method
+        self._message_compression = message_compression
+        self._payload_msg = None
+
+    @property
+    def payload_msg(self) -> Any:
+        if self._raw_payload is not None:
+            raw_payload, self._raw_payload = self._raw_payload, None
+            self._payload_msg = ResponseParser.decode_payload(
+                raw_payload, self._serialization_method, self._message_compression
+            )
+        return self._payload_msg
+
+    @payload_msg.setter
+    def payload_msg(self, value: Any) -> None:
+        self._raw_payload = None
+        self._payload_msg = value
+
+    async def decode_with(self, offload: CodecOffload) -> None:
+        """提前解码：解码后的 payload 达到阈值时在线程池中解压和解析，否则留到首次访问时解码"""
+        raw_payload = self._raw_payload
+        if raw_payload is None or not offload.applies(offload.decoded_size(raw_payload, self._message_compression)):
+            return
+        self._raw_payload = None
+        self._payload_msg = await offload.run(
+            ResponseParser.decode_payload, raw_payload, self._serialization_method, self._message_compression
+        )
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -269,75 +947,208 @@ class AsrResponse:
         }
 
 class ResponseParser:
+    INT32 = struct.Struct('>i')
+    UINT32 = struct.Struct('>I')
+
     @staticmethod
     def parse_response(msg: bytes) -> AsrResponse:
+        view = memoryview(msg)
+        result = ResponseParser.parse_frame(view)
+        if result is None:
+            raise ValueError(f"Truncated server frame: only {len(view)} bytes received")
+
+        response, end = result
+        if end != len(view):
+            logger.warning(f"Ignoring {len(view) - end} trailing bytes after server frame")
+        return response
+
+    @staticmethod
+    def parse_frame(view: memoryview, offset: int = 0) -> Optional[Tuple[AsrResponse, int]]:
+        """从 offset 处解析一帧，数据不完整时返回 None，否则返回 (响应, 帧结束位置)"""
+        available = len(view)
+        if available - offset < 4:
+            return None
+
+        header_size = (view[offset] & 0x0f) * 4
+        message_type = view[offset + 1] >> 4
+        message_type_specific_flags = view[offset + 1] & 0x0f
+        serialization_method = view[offset + 2] >> 4
+        message_compression = view[offset + 2] & 0x0f
+        if header_size < 4:
+            raise ValueError(f"Invalid header size: {header_size}")
+
         response = AsrResponse()
-        
-        header_size = msg[0] & 0x0f
-        message_type = msg[1] >> 4
-        message_type_specific_flags = msg[1] & 0x0f
-        serialization_method = msg[2] >> 4
-        message_compression = msg[2] & 0x0f
-        
-        payload = msg[header_size*4:]
-        
+        pos = offset + header_size
+
         # 解析message_type_specific_flags
         if message_type_specific_flags & 0x01:
-            response.payload_sequence = struct.unpack('>i', payload[:4])[0]
-            payload = payload[4:]
+            if available - pos < 4:
+                return None
+            response.payload_sequence = ResponseParser.INT32.unpack_from(view, pos)[0]
+            pos += 4
         if message_type_specific_flags & 0x02:
             response.is_last_package = True
         if message_type_specific_flags & 0x04:
-            response.event = struct.unpack('>i', payload[:4])[0]
-            payload = payload[4:]
-            
+            if available - pos < 4:
+                return None
+            response.event = ResponseParser.INT32.unpack_from(view, pos)[0]
+            pos += 4
+
         # 解析message_type
         if message_type == MessageType.SERVER_FULL_RESPONSE:
-            response.payload_size = struct.unpack('>I', payload[:4])[0]
-            payload = payload[4:]
+            if available - pos < 4:
+                return None
+            response.payload_size = ResponseParser.UINT32.unpack_from(view, pos)[0]
+            pos += 4
         elif message_type == MessageType.SERVER_ERROR_RESPONSE:
-            response.code = struct.unpack('>i', payload[:4])[0]
-            response.payload_size = struct.unpack('>I', payload[4:8])[0]
-            payload = payload[8:]
-            
-        if not payload:
-            return response
-            
+            if available - pos < 8:
+                return None
+            response.code = ResponseParser.INT32.unpack_from(view, pos)[0]
+            response.payload_size = ResponseParser.UINT32.unpack_from(view, pos + 4)[0]
+            pos += 8
+        else:
+            # 未知的消息类型没有长度字段，无法确定帧的边界，跳过余下的数据
+            logger.warning(f"Skipping {available - pos} bytes of unknown server message type {message_type}")
+            return response, available
+
+        # 校验payload_size与实际到达的数据
+        end = pos + response.payload_size
+        if end > available:
+            return None
+
+        if response.payload_size:
+            # 压缩数据只在这里拷贝一次，解码推迟到首次访问payload_msg
+            response.set_raw_payload(bytes(view[pos:end]), serialization_method, message_compression)
+        return response, end
+
+    @staticmethod
+    def decode_payload(payload: bytes, serialization_method: int, message_compression: int) -> Any:
         # 解压缩
         if message_compression == CompressionType.GZIP:
             try:
                 payload = CommonUtils.gzip_decompress(payload)
             except Exception as e:
                 logger.error(f"Failed to decompress payload: {e}")
-                return response
-                
+                return None
+
         # 解析payload
         try:
             if serialization_method == SerializationType.JSON:
-                response.payload_msg = json.loads(payload.decode('utf-8'))
+                return json.loads(payload.decode('utf-8'))
         except Exception as e:
             logger.error(f"Failed to parse payload: {e}")
-            
-        return response
+        return None
+
+class ResponseStreamParser:
+    """增量解析器：从字节流中解析拼接或分片到达的服务端帧"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    @property
+    def pending(self) -> int:
+        """尚未组成完整帧的字节数"""
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> List[AsrResponse]:
+        self._buffer.extend(data)
+        responses = []
+        offset = 0
+        with memoryview(self._buffer) as view:
+            while True:
+                result = ResponseParser.parse_frame(view, offset)
+                if result is None:
+                    break
+                response, offset = result
+                responses.append(response)
+
+        # 丢弃已解析的部分，保留不完整的尾帧
+        if offset:
+            del self._buffer[:offset]
+        return responses
 
 class AsrWsClient:
-    def __init__(self, url: str, segment_duration: int = 200):
+    def __init__(self, url: str, segment_duration: int = 200,
+                 compressor: PayloadCompressor = DEFAULT_COMPRESSOR,
+                 pacing: PacingPolicy = REALTIME_PACING,
+                 metrics: Optional[LatencyMetrics] = None,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 pipelined: bool = False,
+                 vad: Optional['EnergyVad'] = None,
+                 reconnect_attempts: int = 0, replay_seconds: float = 10.0,
+                 offload: Optional[CodecOffload] = None,
+                 scheduler: Optional[TickScheduler] = None,
+                 send_queue: Optional[SendQueuePolicy] = None):
         self.seq = 1
         self.url = url
         self.segment_duration = segment_duration
+        self.compressor = compressor
+        self.pacing = pacing
+        self.metrics = metrics  # 为None时不做任何延迟统计
+        self.latency: Optional[SessionLatency] = None
+        self.vad = vad  # 为None时发送全部音频
+        self.vad_session: Optional['VadSession'] = None
         self.conn = None
-        self.session = None  # 添加session引用
+        self.session = session  # 添加session引用，外部传入时由调用方负责关闭
+        self._owns_session = session is None
+        self.last_activity = time.monotonic()
+        self.prepared = False  # 已连接并完成完整客户端请求握手，可直接发送音频
+        self.audio_format = WAV_16K_MONO  # 握手时声明的音频格式
+        # 流水线模式：发送完整客户端请求后不等待响应，立即开始发送音频，由接收循环处理确认
+        self.pipelined = pipelined
+        self._pending_config_ack = False
+        self._config_sent_at = 0.0
+        self.frame_encoder = AudioFrameEncoder(compressor)  # 每个客户端复用一个发送缓冲区
+        # 一次识别中最多重连的次数，为0时不重连；重连后重放最近 replay_seconds 秒的音频
+        self.reconnect_attempts = reconnect_attempts
+        self.replay_seconds = replay_seconds
+        self._resume: Optional[ResumeState] = None
+        self.offload = offload  # 为None时压缩和解码都在事件循环线程中执行
+        self.scheduler = scheduler  # 多个会话共用的发送节拍，为None时各自按截止时间等待
+        # 为None时读出一段发送一段；设置后读取与发送之间经过有界队列，本次识别的队列状态保存在 send_queue_state
+        self.send_queue = send_queue
+        self.send_queue_state: Optional[SendQueue] = None
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self._owns_session:
+            self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc, tb):
         if self.conn and not self.conn.closed:
             await self.conn.close()
-        if self.session and not self.session.closed:
+        if self._owns_session and self.session and not self.session.closed:
             await self.session.close()
         
+    @staticmethod
+    def needs_conversion(header: bytes) -> bool:
+        """WAV参数与完整客户端请求中声明的 16kHz/16bit/单声道 不一致"""
+        try:
+            channel_num, samp_width, frame_rate = CommonUtils.read_wav_info(header)[:3]
+        except ValueError:
+            return False
+        return not WAV_16K_MONO.same_pcm_params(frame_rate, samp_width * 8, channel_num)
+
+    async def open_audio_source(self, file_path: str) -> AudioSource:
+        try:
+            source = WavFileSource(file_path)
+            is_wav = CommonUtils.judge_wav(source.header)
+            if is_wav and not self.needs_conversion(source.header):
+                return source
+            source.close()
+
+            if is_wav and PcmNormalizer is not None:
+                format_tag, _, sample_width = read_wav_format(source.header)[:3]
+                if PcmNormalizer.supports(format_tag, sample_width):
+                    logger.info("Normalizing WAV to 16kHz/16bit/mono...")
+                    return NormalizedWavSource(file_path)
+
+            logger.info("Converting audio to WAV format...")
+            return await FfmpegAudioSource.start(file_path, DEFAULT_SAMPLE_RATE)
+        except Exception as e:
+            logger.error(f"Failed to open audio source: {e}")
+            raise
+
     async def read_audio_data(self, file_path: str) -> bytes:
         try:
             with open(file_path, 'rb') as f:
@@ -345,7 +1156,7 @@ class AsrWsClient:
                 
             if not CommonUtils.judge_wav(content):
                 logger.info("Converting audio to WAV format...")
-                content = CommonUtils.convert_wav_with_path(file_path, DEFAULT_SAMPLE_RATE)
+                content = await asyncio.to_thread(CommonUtils.convert_wav_with_path, file_path, DEFAULT_SAMPLE_RATE)
                 
             return content
         except Exception as e:
@@ -374,52 +1185,191 @@ class AsrWsClient:
             logger.error(f"Failed to connect to WebSocket: {e}")
             raise
             
-    async def send_full_client_request(self) -> None:
-        request = RequestBuilder.new_full_client_request(self.seq)
+    async def send_full_client_request(self, wait_response: bool = True) -> Optional[AsrResponse]:
+        request = RequestBuilder.new_full_client_request(self.seq, self.compressor, self.audio_format)
         self.seq += 1  # 发送后递增
         try:
+            self._config_sent_at = time.monotonic()
             await self.conn.send_bytes(request)
             logger.info(f"Sent full client request with seq: {self.seq-1}")
+            if not wait_response:
+                return None
             
             msg = await self.conn.receive()
+            if self.latency is not None:
+                self.latency.on_handshake(time.monotonic() - self._config_sent_at)
             if msg.type == aiohttp.WSMsgType.BINARY:
                 response = ResponseParser.parse_response(msg.data)
                 logger.info(f"Received response: {response.to_dict()}")
-            else:
-                logger.error(f"Unexpected message type: {msg.type}")
+                return response
+            logger.error(f"Unexpected message type: {msg.type}")
+            return None
         except Exception as e:
             logger.error(f"Failed to send full client request: {e}")
             raise
             
-    async def send_messages(self, segment_size: int, content: bytes) -> AsyncGenerator[None, None]:
-        audio_segments = self.split_audio(content, segment_size)
-        total_segments = len(audio_segments)
+    async def send_messages(self, segment_size: int,
+                            content: Union[bytes, AudioSource]) -> AsyncGenerator[None, None]:
+        source = content if isinstance(content, AudioSource) else BytesAudioSource(content)
+        interval = self.pacing.interval(self.segment_duration)
+        loop = asyncio.get_running_loop()
+        # 按单调时钟的截止时间排程，发送和压缩耗时不会累积成漂移
+        deadline = loop.time()
+        if self.vad is not None:
+            self.vad_session = self.vad.session(segment_size * 1000 // self.segment_duration)
+        queue = writer = None
+        if self.send_queue is not None:
+            # 读取与发送解耦：发送方等待网络时，排队的分段数受 max_pending 限制
+            queue = self.send_queue_state = SendQueue(self.send_queue, self.latency)
+            writer = asyncio.create_task(self._drain_send_queue(queue))
+
+            def on_writer_done(task: asyncio.Task) -> None:
+                if not task.cancelled() and task.exception() is not None:
+                    queue.fail(task.exception())
+            writer.add_done_callback(on_writer_done)
         
-        for i, segment in enumerate(audio_segments):
-            is_last = (i == total_segments - 1)
-            request = RequestBuilder.new_audio_only_request(
-                self.seq, 
-                segment,
-                is_last=is_last
-            )
-            await self.conn.send_bytes(request)
-            logger.info(f"Sent audio segment with seq: {self.seq} (last: {is_last})")
-            
-            if not is_last:
-                self.seq += 1
+        try:
+            last_queued = False
+            async for segment, is_last in source.asegments(segment_size):
+                # 启用静音检测时，长静音不发送，语音开始时可能一次带出前置静音
+                outgoing = [(segment, is_last)] if self.vad_session is None else self.vad_session.process(segment, is_last)
+                for packet, packet_is_last in outgoing:
+                    if queue is not None:
+                        await queue.put(packet, packet_is_last)
+                        last_queued = last_queued or packet_is_last
+                    else:
+                        await self._send_audio(packet, packet_is_last)
+                    
+                if is_last and self.vad_session is not None:
+                    logger.info(f"VAD skipped {self.vad_session.skipped_ratio:.1%} of "
+                                f"{self.vad_session.total_ms / 1000:.1f}s audio")
+                    
+                if interval:
+                    deadline += interval
+                    if self.scheduler is not None:
+                        await self.scheduler.sleep_until(deadline)
+                    else:
+                        await asyncio.sleep(max(deadline - loop.time(), 0))
+                else:
+                    await asyncio.sleep(0)
+                # 让出控制权，允许接受消息
+                yield
                 
-            await asyncio.sleep(self.segment_duration / 1000) # 逐个发送，间隔时间模拟实时流
-            # 让出控制权，允许接受消息
-            yield
+            if writer is not None and last_queued:
+                # 等待队列中剩余的分段发送完
+                await writer
+                logger.info(f"Send queue: {queue.snapshot()}")
+        finally:
+            if writer is not None and not writer.done():
+                writer.cancel()
+                
+    async def _drain_send_queue(self, queue: SendQueue) -> None:
+        while True:
+            data, is_last = await queue.get()
+            await self._send_audio(data, is_last)
+            if is_last:
+                return
             
-    async def recv_messages(self) -> AsyncGenerator[AsrResponse, None]:
+    async def _send_audio(self, packet: bytes, is_last: bool) -> None:
+        if self._resume is not None:
+            # 重连期间等待新会话就绪；先写入重放缓冲区，发送失败的包会随重放补发
+            await self._resume.connected.wait()
+            self._resume.record(packet, is_last)
+        if self.offload is not None:
+            request = await self.frame_encoder.encode_offloaded(self.seq, packet, is_last, self.offload)
+        else:
+            request = self.frame_encoder.encode(self.seq, packet, is_last=is_last)
+        conn = self.conn
+        try:
+            await conn.send_bytes(request)
+        except ConnectionError as e:
+            if self._resume is None:
+                raise
+            logger.warning(f"Failed to send audio segment with seq {self.seq}: {e}")
+            # 发送期间可能已经完成重连，只有旧连接仍在用时才需要等待重连
+            if conn is self.conn:
+                self._resume.connected.clear()
+            return
+        self.last_activity = time.monotonic()
+        if self.latency is not None:
+            self.latency.on_send(self.seq)
+        logger.info(f"Sent audio segment with seq: {self.seq} (last: {is_last})")
+        
+        if not is_last:
+            self.seq += 1
+            
+    async def _reconnect(self) -> None:
+        """建立新会话并重放缓冲区中的音频，失败时重试，直到用完本次识别的重连次数"""
+        resume = self._resume
+        resume.connected.clear()
+        while resume.reconnects < self.reconnect_attempts:
+            resume.reconnects += 1
+            attempt = resume.reconnects
+            await asyncio.sleep(min(0.5 * (attempt - 1), 5.0))
+            try:
+                if self.conn and not self.conn.closed:
+                    await self.conn.close()
+                # 新会话直接接收不带WAV头的PCM
+                await self.prepare(resume.audio_format)
+                replay, offset_ms = resume.plan_replay()
+                if self.vad_session is not None:
+                    # 之前会话的句子之后在每条响应中共用，只在这里换算一次原始音频时间
+                    self.vad_session.remap_result({"result": {"utterances": resume.stitcher.carried}})
+                logger.info(f"Reconnected (attempt {attempt}), replaying {len(replay)} bytes from {offset_ms:.0f} ms")
+                view = memoryview(replay)
+                for start in range(0, len(view), resume.segment_size):
+                    end = start + resume.segment_size
+                    is_last = resume.source_done and end >= len(view)
+                    await self.conn.send_bytes(self.frame_encoder.encode(self.seq, view[start:end], is_last=is_last))
+                    if not is_last:
+                        self.seq += 1
+                if resume.source_done and not view:
+                    await self.conn.send_bytes(self.frame_encoder.encode(self.seq, b'', is_last=True))
+                self.last_activity = time.monotonic()
+                resume.connected.set()
+                return
+            except (ConnectionError, aiohttp.ClientError, RuntimeError) as e:
+                logger.warning(f"Reconnect attempt {attempt} failed: {e}")
+        raise ConnectionError(f"ASR connection lost, giving up after {resume.reconnects} reconnect attempts")
+        
+    def _handle_config_ack(self, response: AsrResponse) -> None:
+        """流水线模式下，接收循环收到的第一条响应是完整客户端请求的确认"""
+        self._pending_config_ack = False
+        if self.latency is not None:
+            self.latency.on_handshake(time.monotonic() - self._config_sent_at)
+        logger.info(f"Received config ack: code={response.code}")
+        if response.code != 0:
+            raise RuntimeError(f"Full client request rejected (code: {response.code})")
+            
+    async def recv_messages(self, finals_only: bool = False) -> AsyncGenerator[AsrResponse, None]:
+        """finals_only=True 时只返回最终结果和错误，中间结果不会被解码"""
         try:
             async for msg in self.conn:
                 if msg.type == aiohttp.WSMsgType.BINARY:
                     response = ResponseParser.parse_response(msg.data)
-                    yield response
+                    self.last_activity = time.monotonic()
+                    if self._pending_config_ack:
+                        self._handle_config_ack(response)
+                        continue
+                    is_final = response.is_last_package or response.code != 0
+                    if self.latency is not None:
+                        self.latency.on_response(response.payload_sequence, is_final)
+                    if self.offload is not None and response.code == 0 and (
+                            is_final or not finals_only or self._resume is not None):
+                        # 等待解码完成再处理下一条，保持本会话的响应顺序
+                        await response.decode_with(self.offload)
+                    if self._resume is not None and response.code == 0:
+                        # 续传需要跟踪已确定的句子，每条响应都要解码
+                        response.payload_msg = self._resume.stitcher.stitch(response.payload_msg)
+                        self._resume.stitcher.observe(response.payload_msg)
+                    if is_final or not finals_only:
+                        if self.vad_session is not None and response.code == 0:
+                            # 服务端时间戳基于跳过静音后的音频，换算回原始音频时间
+                            carried = len(self._resume.stitcher.carried) if self._resume is not None else 0
+                            self.vad_session.remap_result(response.payload_msg, skip=carried)
+                        yield response
                     
-                    if response.is_last_package or response.code != 0:
+                    if is_final:
                         break
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     logger.error(f"WebSocket error: {msg.data}")
@@ -431,17 +1381,39 @@ class AsrWsClient:
             logger.error(f"Error receiving messages: {e}")
             raise
             
-    async def start_audio_stream(self, segment_size: int, content: bytes) -> AsyncGenerator[AsrResponse, None]:
+    async def start_audio_stream(self, segment_size: int, content: Union[bytes, AudioSource],
+                                 finals_only: bool = False) -> AsyncGenerator[AsrResponse, None]:
         async def sender():
             async for _ in self.send_messages(segment_size, content):
                 pass
                 
+        def sender_failed() -> bool:
+            return sender_task.done() and not sender_task.cancelled() and sender_task.exception() is not None
+
+        def on_sender_done(task: asyncio.Task) -> None:
+            # 发送失败后服务端等不到最后一包，关闭连接结束接收，异常在 finally 中抛出
+            if sender_failed() and self.conn is not None:
+                asyncio.ensure_future(self.conn.close())
+                
         # 启动发送和接收任务
         sender_task = asyncio.create_task(sender())
+        sender_task.add_done_callback(on_sender_done)
         
         try:
-            async for response in self.recv_messages():
-                yield response
+            while True:
+                finished = False
+                try:
+                    async for response in self.recv_messages(finals_only):
+                        finished = finished or response.is_last_package or response.code != 0
+                        yield response
+                except (ConnectionError, aiohttp.ClientError):
+                    if self._resume is None or sender_failed():
+                        raise
+                # 未收到最终结果就断开：启用续传时重连后继续接收
+                if finished or self._resume is None or sender_failed():
+                    break
+                logger.warning("ASR connection lost before the final result, reconnecting")
+                await self._reconnect()
         finally:
             sender_task.cancel()
             try:
@@ -462,30 +1434,99 @@ class AsrWsClient:
             segments.append(data[i:end])
         return segments
         
-    async def execute(self, file_path: str) -> AsyncGenerator[AsrResponse, None]:
+    async def prepare(self, audio_format: Optional[AudioFormat] = None) -> None:
+        """建立连接并完成完整客户端请求握手，之后调用 execute 可立即发送音频
+
+        audio_format 为握手时声明的格式，默认沿用上一次的格式（初始为 WAV_16K_MONO）
+        """
+        if not self.url:
+            raise ValueError("URL is empty")
+        if audio_format is not None:
+            self.audio_format = audio_format
+            
+        self.seq = 1
+        self._pending_config_ack = False
+        self.latency = self.metrics.session() if self.metrics is not None else None
+        await self.create_connection()
+        if self.pipelined:
+            await self.send_full_client_request(wait_response=False)
+            self._pending_config_ack = True
+            self.prepared = True
+            self.last_activity = time.monotonic()
+            return
+            
+        response = await self.send_full_client_request()
+        if response is None or response.code != 0:
+            code = response.code if response is not None else None
+            raise RuntimeError(f"Full client request rejected (code: {code})")
+        self.prepared = True
+        self.last_activity = time.monotonic()
+        
+    def _new_resume_state(self, source: AudioSource, segment_size: int) -> ResumeState:
+        if source.audio_format is not None:
+            fmt = source.audio_format
+            header_size = 0
+        else:
+            channel_num, samp_width, frame_rate = CommonUtils.read_wav_info(source.header)[:3]
+            fmt = AudioFormat("pcm", rate=frame_rate, bits=samp_width * 8, channel=channel_num)
+            header_size = CommonUtils.wav_data_offset(source.header)
+        return ResumeState(fmt.bytes_per_second, fmt.bits // 8 * fmt.channel, self.replay_seconds,
+                           header_size, segment_size, AudioFormat("pcm", fmt.codec, fmt.rate, fmt.bits, fmt.channel))
+        
+    async def execute_stream(self, source: AsyncIterable[bytes], audio_format: AudioFormat = PCM_16K_MONO,
+                             finals_only: bool = False) -> AsyncGenerator[AsrResponse, None]:
+        """识别实时到达的音频流，source 结束时发送最后一包
+
+        G.711 音频，以及参数与 16kHz/16bit/单声道 不一致的 PCM（需要 NumPy），逐块转换后再发送
+        """
+        if audio_format.format == "pcm" and (
+                audio_format.codec in G711_CODECS or (audio_format.codec == "raw" and not PCM_16K_MONO.same_pcm_params(
+                    audio_format.rate, audio_format.bits, audio_format.channel))):
+            if PcmNormalizer is not None:
+                normalizer = PcmNormalizer.from_codec(audio_format.codec, audio_format.rate, audio_format.channel,
+                                                      audio_format.bits, DEFAULT_SAMPLE_RATE)
+                source = normalize_stream(source, normalizer)
+                audio_format = PCM_16K_MONO
+            elif audio_format.codec in G711_CODECS:
+                raise RuntimeError("G.711 decoding requires NumPy")
+        async for response in self.execute(StreamAudioSource(source, audio_format), finals_only):
+            yield response
+            
+    async def execute(self, file_path: Union[str, AudioSource],
+                      finals_only: bool = False) -> AsyncGenerator[AsrResponse, None]:
+        """file_path 可以是文件路径，也可以是已打开的 AudioSource"""
         if not file_path:
             raise ValueError("File path is empty")
             
         if not self.url:
             raise ValueError("URL is empty")
             
-        self.seq = 1
+        source = None
         
         try:
-            # 1. 读取音频文件
-            content = await self.read_audio_data(file_path)
+            # 1. 打开音频来源（按段惰性读取，不整体载入内存）
+            source = file_path if isinstance(file_path, AudioSource) else await self.open_audio_source(file_path)
             
             # 2. 计算分段大小
-            segment_size = self.get_segment_size(content)
-            
-            # 3. 创建WebSocket连接
-            await self.create_connection()
+            if source.audio_format is not None:
+                segment_size = source.audio_format.segment_size(self.segment_duration)
+            else:
+                segment_size = self.get_segment_size(source.header)
+            audio_format = source.audio_format or WAV_16K_MONO
+            self._resume = self._new_resume_state(source, segment_size) if self.reconnect_attempts else None
+            if self.prepared and not self.audio_format.accepts(audio_format):
+                # 预热时声明的格式与本次音频不一致，需要重新握手
+                await self.conn.close()
+                self.prepared = False
             
-            # 4. 发送完整客户端请求
-            await self.send_full_client_request()
+            # 3. 创建WebSocket连接并发送完整客户端请求（预热过的会话跳过这一步）
+            if not self.prepared:
+                await self.prepare(audio_format)
+            # 一次握手只对应一路音频流
+            self.prepared = False
             
-            # 5. 启动音频流处理
-            async for response in self.start_audio_stream(segment_size, content):
+            # 4. 启动音频流处理
+            async for response in self.start_audio_stream(segment_size, source, finals_only):
                 yield response
                 
         except Exception as e:
@@ -494,6 +1535,8 @@ class AsrWsClient:
         finally:
             if self.conn:
                 await self.conn.close()
+            if source is not None and source is not file_path:
+                await source.aclose()
 
 async def main():
     import argparse
@@ -508,15 +1551,59 @@ async def main():
                        help="WebSocket URL")
     parser.add_argument("--seg-duration", type=int, default=200, 
                        help="Audio duration(ms) per packet, default:200")
+    parser.add_argument("--compression", type=str, default="gzip",
+                       help="Payload compression: none | gzip[:level[:min_bytes]], default:gzip")
+    parser.add_argument("--pacing", type=str, default="realtime",
+                       help="Send pacing: realtime | x<N> (N times realtime) | max, default:realtime")
+    parser.add_argument("--metrics", action="store_true",
+                       help="Record latency histograms and print them in Prometheus text format at the end")
+    parser.add_argument("--pipelined", action="store_true",
+                       help="Start sending audio without waiting for the full client request response")
+    parser.add_argument("--finals-only", action="store_true",
+                       help="Only output final results, skip decoding partial results")
+    parser.add_argument("--deltas", action="store_true",
+                       help="Print only new or changed utterances instead of every cumulative response")
+    parser.add_argument("--reconnect", type=int, default=0,
+                       help="Max reconnects per recognition when the connection drops, default:0 (disabled)")
+    parser.add_argument("--replay-seconds", type=float, default=10.0,
+                       help="Seconds of sent audio kept for replay after reconnecting, default:10")
+    parser.add_argument("--vad", type=str, default=None,
+                       help="Skip long silences: energy[:threshold_db[:hangover_ms[:preroll_ms]]] (requires NumPy)")
+    parser.add_argument("--send-queue", type=str, default=None,
+                       help="Bounded send queue: block[:N] | coalesce[:N[:K]] (K <= N) | drop[:N], default: send directly")
+    parser.add_argument("--offload", type=str, default="off",
+                       help="Run gzip/JSON work on large payloads in a thread pool: off | thread[:min_bytes[:workers]], default:off")
     
     args = parser.parse_args()
+    if args.vad and EnergyVad is None:
+        parser.error("--vad requires NumPy")
     
-    async with AsrWsClient(args.url, args.seg_duration) as client:  # 使用async with
+    compressor = PayloadCompressor.from_spec(args.compression)
+    pacing = PacingPolicy.from_spec(args.pacing)
+    metrics = LatencyMetrics() if args.metrics else None
+    vad = EnergyVad.from_spec(args.vad) if args.vad else None
+    offload = CodecOffload.from_spec(args.offload)
+    send_queue = SendQueuePolicy.from_spec(args.send_queue) if args.send_queue else None
+    async with AsrWsClient(args.url, args.seg_duration, compressor, pacing, metrics,
+                           pipelined=args.pipelined, vad=vad, reconnect_attempts=args.reconnect,
+                           replay_seconds=args.replay_seconds, offload=offload,
+                           send_queue=send_queue) as client:  # 使用async with
         try:
-            async for response in client.execute(args.file):
-                logger.info(f"Received response: {json.dumps(response.to_dict(), indent=2, ensure_ascii=False)}")
+            responses = client.execute(args.file, finals_only=args.finals_only)
+            if args.deltas:
+                from sauc_transcript import TranscriptAssembler
+                async for delta in TranscriptAssembler().follow(responses):
+                    logger.info(f"Transcript delta: {json.dumps(delta.to_dict(), ensure_ascii=False)}")
+            else:
+                async for response in responses:
+                    logger.info(f"Received response: {json.dumps(response.to_dict(), indent=2, ensure_ascii=False)}")
         except Exception as e:
             logger.error(f"ASR processing failed: {e}")
+    
+    if offload is not None:
+        offload.shutdown()
+    if metrics is not None:
+        print(metrics.to_prometheus(), end="")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,338 @@
+"""
+多进程 ASR 工作池
+- 每个工作进程有独立的事件循环和 AsrSessionPool，压缩、JSON 解码、重采样分摊到多个核
+- 按通话 ID 的一致性哈希选择工作进程，同一通话始终由同一进程处理；调整进程数时只有少部分通话换进程
+- 识别结果和延迟统计汇总回主进程
+- 实时音频流默认经由队列转发；shared_memory=True 时每个通话使用一个共享内存环形缓冲区，
+  音频块不经过 pickle，工作进程直接从共享内存分段发送
+工作进程使用 spawn 方式启动，调用方脚本需要放在 if __name__ == "__main__": 下
+"""
+
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import threading
+from typing import Any, AsyncGenerator, AsyncIterable, Dict, List, Optional, Tuple
+
+from sauc_metrics import LatencyMetrics
+from sauc_pool import AsrSessionPool
+from sauc_shm import DEFAULT_RING_SLOTS, POLL_INTERVAL, SharedAudioRing
+from sauc_websocket_demo import PCM_16K_MONO, AudioFormat, logger
+
+DEFAULT_VIRTUAL_NODES = 64
+DEFAULT_SEGMENT_DURATION = 200  # 与 AsrSessionPool 的默认值一致
+WORKER_CHECK_INTERVAL = 1.0  # 等待结果时检查工作进程是否存活的间隔
+
+
+class ConsistentHashRing:
+    def __init__(self, nodes: int, virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        if nodes <= 0:
+            raise ValueError("nodes must be positive")
+        # 每个节点在环上放置多个虚拟点，使通话分布均匀
+        points = sorted(
+            (self._hash(f"worker-{node}#{replica}"), node)
+            for node in range(nodes) for replica in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+    def node_for(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+async def _worker_loop(index: int, url: str, pool_options: Dict[str, Any], with_metrics: bool,
+                       commands: multiprocessing.Queue, results: multiprocessing.Queue, ring_lock: Any) -> None:
+    loop = asyncio.get_running_loop()
+    metrics = LatencyMetrics() if with_metrics else None
+    streams: Dict[str, asyncio.Queue] = {}
+    tasks = set()
+
+    async def chunks(queue: asyncio.Queue) -> AsyncGenerator[bytes, None]:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def run_call(pool: AsrSessionPool, call_id: str, source: Any, audio_format: Optional[AudioFormat],
+                       finals_only: bool, ring: Optional[SharedAudioRing] = None) -> None:
+        error = None
+        try:
+            async with pool.session(call_id) as client:
+                if audio_format is None:
+                    responses = client.execute(source, finals_only)
+                else:
+                    responses = client.execute_stream(source, audio_format, finals_only)
+                async for response in responses:
+                    results.put(("response", call_id, response.to_dict()))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            streams.pop(call_id, None)
+            if ring is not None:
+                # 先结束读取，释放指向共享内存的 memoryview，再关闭映射
+                await source.aclose()
+                ring.close()
+        results.put(("done", call_id, error))
+
+    async with AsrSessionPool(url, metrics=metrics, **pool_options) as pool:
+        while True:
+            # multiprocessing.Queue 只能阻塞读取，放到线程里等待
+            command = await loop.run_in_executor(None, commands.get)
+            kind = command[0]
+            if kind == "stop":
+                break
+            if kind == "file":
+                _, call_id, file_path, finals_only = command
+                task = asyncio.create_task(run_call(pool, call_id, file_path, None, finals_only))
+            elif kind == "open":
+                _, call_id, audio_format, finals_only = command
+                streams[call_id] = asyncio.Queue()
+                task = asyncio.create_task(
+                    run_call(pool, call_id, chunks(streams[call_id]), audio_format, finals_only))
+            elif kind == "ring":
+                _, call_id, ring_name, audio_format, finals_only = command
+                try:
+                    ring = SharedAudioRing.attach(ring_name, ring_lock)
+                except OSError as e:
+                    results.put(("done", call_id, f"{type(e).__name__}: {e}"))
+                    continue
+                task = asyncio.create_task(
+                    run_call(pool, call_id, ring.chunks(), audio_format, finals_only, ring))
+            elif kind in ("audio", "end"):
+                queue = streams.get(command[1])
+                if queue is not None:
+                    queue.put_nowait(command[2] if kind == "audio" else None)
+                continue
+            elif kind == "metrics":
+                results.put(("metrics", index, metrics))
+                continue
+            else:
+                logger.error(f"Worker {index} received unknown command: {kind}")
+                continue
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    results.put(("stopped", index, None))
+
+
+def _worker_main(index: int, url: str, pool_options: Dict[str, Any], with_metrics: bool,
+                 commands: multiprocessing.Queue, results: multiprocessing.Queue, ring_lock: Any) -> None:
+    asyncio.run(_worker_loop(index, url, pool_options, with_metrics, commands, results, ring_lock))
+
+
+class ShardedAsrSupervisor:
+    """在主进程中使用：把通话分派到工作进程，并以异步迭代器的形式返回结果
+
+    pool_options 原样传给每个工作进程的 AsrSessionPool（max_sessions 为单个进程的上限），需可 pickle
+    shared_memory=True 时实时音频流经由共享内存环形缓冲区传递，每个通话 ring_slots 个分段大小的槽位，
+    工作进程每隔 ring_poll_interval 秒检查一次新音频；同一工作进程的缓冲区共用一把进程间锁发布游标
+    """
+
+    def __init__(self, url: str, workers: Optional[int] = None, with_metrics: bool = False,
+                 virtual_nodes: int = DEFAULT_VIRTUAL_NODES, shared_memory: bool = False,
+                 ring_slots: int = DEFAULT_RING_SLOTS, ring_poll_interval: float = POLL_INTERVAL,
+                 **pool_options: Any):
+        self.url = url
+        self.workers = workers or os.cpu_count() or 1
+        self.with_metrics = with_metrics
+        self.pool_options = pool_options
+        self.shared_memory = shared_memory
+        self.ring_slots = ring_slots
+        self.ring_poll_interval = ring_poll_interval
+        self.ring = ConsistentHashRing(self.workers, virtual_nodes)
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._commands: List[multiprocessing.Queue] = []
+        self._ring_locks: List[Any] = []
+        self._results: Optional[multiprocessing.Queue] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._calls: Dict[str, Tuple[int, asyncio.Queue]] = {}
+        self._metrics_replies: Optional[asyncio.Queue] = None
+        self._metrics_lock = asyncio.Lock()
+        self.routed = [0] * self.workers
+
+    async def start(self) -> 'ShardedAsrSupervisor':
+        self._loop = asyncio.get_running_loop()
+        self._metrics_replies = asyncio.Queue()
+        self._results = self._context.Queue()
+        for index in range(self.workers):
+            commands = self._context.Queue()
+            # 锁只能在启动进程时传入，每个工作进程一把，由它的所有共享内存缓冲区共用
+            ring_lock = self._context.Lock()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self.url, self.pool_options, self.with_metrics, commands, self._results, ring_lock),
+                name=f"asr-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            self._commands.append(commands)
+            self._ring_locks.append(ring_lock)
+            self._processes.append(process)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="asr-result-dispatcher", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Started {self.workers} ASR worker processes")
+        return self
+
+    async def stop(self) -> None:
+        """等待工作进程处理完已分派的通话后退出"""
+        for commands in self._commands:
+            commands.put(("stop",))
+        for process in self._processes:
+            await self._loop.run_in_executor(None, process.join)
+        if self._dispatcher:
+            self._results.put(None)
+            await self._loop.run_in_executor(None, self._dispatcher.join)
+        self._processes, self._commands, self._ring_locks, self._dispatcher = [], [], [], None
+
+    async def __aenter__(self) -> 'ShardedAsrSupervisor':
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.stop()
+
+    def _dispatch(self) -> None:
+        """结果分发线程：从跨进程队列读取消息，交给事件循环处理"""
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._route, message)
+
+    def _route(self, message: Tuple[str, Any, Any]) -> None:
+        kind, key, value = message
+        if kind in ("response", "done"):
+            call = self._calls.get(key)
+            if call is not None:
+                call[1].put_nowait((kind, value))
+        elif kind == "metrics":
+            self._metrics_replies.put_nowait(value)
+        elif kind == "stopped":
+            logger.info(f"ASR worker {key} stopped")
+
+    def worker_for(self, call_id: str) -> int:
+        return self.ring.node_for(call_id)
+
+    def _register(self, call_id: str) -> int:
+        if not self._processes:
+            raise RuntimeError("Supervisor is not started")
+        if call_id in self._calls:
+            raise ValueError(f"Call {call_id} is already running")
+        index = self.worker_for(call_id)
+        self._calls[call_id] = (index, asyncio.Queue())
+        self.routed[index] += 1
+        return index
+
+    async def _responses(self, call_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        index, queue = self._calls[call_id]
+        try:
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), WORKER_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    if not self._processes[index].is_alive():
+                        raise RuntimeError(f"ASR worker {index} exited while handling call {call_id}")
+                    continue
+                if kind == "done":
+                    if value is not None:
+                        raise RuntimeError(f"Call {call_id} failed on worker {index}: {value}")
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            self._calls.pop(call_id, None)
+
+    async def transcribe(self, call_id: str, file_path: str,
+                         finals_only: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
+        """识别文件，逐条返回响应（AsrResponse.to_dict() 的结果）"""
+        index = self._register(call_id)
+        self._commands[index].put(("file", call_id, file_path, finals_only))
+        async for response in self._responses(call_id):
+            yield response
+
+    async def transcribe_stream(self, call_id: str, chunks: AsyncIterable[bytes],
+                                audio_format: AudioFormat = PCM_16K_MONO,
+                                finals_only: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
+        """识别实时音频流，音频块经由队列或共享内存转发给负责该通话的工作进程
+
+        chunks 抛出的异常会结束该通话，并由返回的迭代器原样抛出
+        """
+        index = self._register(call_id)
+        commands = self._commands[index]
+        replies = self._calls[call_id][1]
+        ring = None
+        if self.shared_memory:
+            segment_duration = self.pool_options.get("segment_duration", DEFAULT_SEGMENT_DURATION)
+            ring = SharedAudioRing.create(audio_format.segment_size(segment_duration), self.ring_slots,
+                                          self._ring_locks[index], self.ring_poll_interval)
+            commands.put(("ring", call_id, ring.name, audio_format, finals_only))
+        else:
+            commands.put(("open", call_id, audio_format, finals_only))
+
+        async def forward() -> None:
+            try:
+                if ring is not None:
+                    try:
+                        # 缓冲区满时等待工作进程读取，相当于队列的背压
+                        async for chunk in chunks:
+                            await ring.awrite(chunk)
+                    finally:
+                        ring.close_writer()
+                    return
+                try:
+                    async for chunk in chunks:
+                        commands.put(("audio", call_id, bytes(chunk)))
+                finally:
+                    # 音频源出错或调用方提前结束时也要结束该通话，否则工作进程一直等待音频
+                    commands.put(("end", call_id, None))
+            except Exception as e:
+                # 交给结果迭代器抛出
+                replies.put_nowait(("error", e))
+
+        forwarder = asyncio.create_task(forward())
+        try:
+            async for response in self._responses(call_id):
+                yield response
+        finally:
+            forwarder.cancel()
+            try:
+                await forwarder
+            except asyncio.CancelledError:
+                pass
+            if ring is not None:
+                ring.close()
+
+    async def metrics(self) -> LatencyMetrics:
+        """汇总所有工作进程的延迟统计"""
+        if not self.with_metrics:
+            raise RuntimeError("Supervisor was started without metrics")
+        async with self._metrics_lock:
+            for commands in self._commands:
+                commands.put(("metrics",))
+            merged = LatencyMetrics()
+            for _ in self._processes:
+                merged.merge(await self._metrics_replies.get())
+            return merged
+
+    def stats(self) -> Dict[str, Any]:
+        active = [0] * self.workers
+        for index, _ in self._calls.values():
+            active[index] += 1
+        return {
+            "workers": self.workers,
+            "alive": sum(process.is_alive() for process in self._processes),
+            "active_calls": active,
+            "routed_calls": list(self.routed),
+        }
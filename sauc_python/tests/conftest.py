@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 被测模块都在上一级目录，按脚本方式直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
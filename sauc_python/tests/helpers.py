@@ -0,0 +1,22 @@
+"""各测试模块共用的音频构造工具"""
+
+import asyncio
+import struct
+
+from sauc_websocket_demo import PacingPolicy
+
+NO_PACING = PacingPolicy(0)
+
+
+def make_wav(pcm, sample_rate=16000, extra_chunks=b''):
+    """给 16bit 单声道 PCM 加上 WAV 头，extra_chunks 插在 fmt 与 data 子块之间"""
+    return (b'RIFF' + struct.pack('<I', 36 + len(extra_chunks) + len(pcm)) + b'WAVE'
+            + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + extra_chunks + b'data' + struct.pack('<I', len(pcm)) + pcm)
+
+
+async def pcm_chunks(total, chunk_size):
+    """按 chunk_size 产出共 total 字节的静音，每块之间让出一次事件循环"""
+    for start in range(0, total, chunk_size):
+        yield bytes(min(chunk_size, total - start))
+        await asyncio.sleep(0)
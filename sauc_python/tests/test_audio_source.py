@@ -0,0 +1,107 @@
+import asyncio
+import struct
+import sys
+
+import pytest
+
+from helpers import NO_PACING, make_wav
+from sauc_mock_server import MockAsrServer
+from sauc_websocket_demo import AsrWsClient, CommonUtils, FfmpegAudioSource, NormalizedWavSource, WavFileSource
+
+# 超过旧版 4KB 探测长度的 LIST 元数据子块，位于 fmt 与 data 之间
+LIST_CHUNK = b'LIST' + struct.pack('<I', 8192) + b'INFO' + bytes(8188)
+
+# 代替 ffmpeg 的子进程：先往 stderr 写入约 500KB 日志，再把静音 WAV 写到 stdout
+FAKE_FFMPEG = """
+import struct, sys
+pcm_size, returncode = int(sys.argv[1]), int(sys.argv[2])
+sys.stderr.write("frame= 1 fps=0.0 q=-0.0 size=0kB time=00:00:00.00 bitrate=N/A\\n" * 8000)
+sys.stderr.flush()
+sys.stdout.buffer.write(b'RIFF' + struct.pack('<I', 36 + pcm_size) + b'WAVE'
+                        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, 16000, 32000, 2, 16)
+                        + b'data' + struct.pack('<I', pcm_size) + bytes(pcm_size))
+sys.exit(returncode)
+"""
+
+
+def fake_ffmpeg(monkeypatch, pcm_size, returncode=0):
+    monkeypatch.setattr(CommonUtils, "ffmpeg_wav_command",
+                        lambda *args: [sys.executable, "-c", FAKE_FFMPEG, str(pcm_size), str(returncode)])
+
+
+async def read_all(source):
+    data = bytearray()
+    try:
+        async for segment, _ in source.asegments(6400):
+            data += segment
+    finally:
+        await source.aclose()
+    return bytes(data)
+
+
+def test_large_stderr_does_not_block_conversion(monkeypatch):
+    fake_ffmpeg(monkeypatch, 32000)
+
+    async def run():
+        source = await FfmpegAudioSource.start("input.mp3")
+        return await read_all(source), source
+
+    data, source = asyncio.run(asyncio.wait_for(run(), 10))
+    assert data == make_wav(bytes(32000))
+    assert source._process.returncode == 0
+
+
+def test_conversion_failure_reports_stderr_tail(monkeypatch):
+    fake_ffmpeg(monkeypatch, 3200, returncode=1)
+
+    async def run():
+        source = await FfmpegAudioSource.start("input.mp3")
+        return await read_all(source)
+
+    with pytest.raises(RuntimeError) as error:
+        asyncio.run(asyncio.wait_for(run(), 10))
+    assert "bitrate=N/A" in str(error.value)
+    assert len(str(error.value)) < FfmpegAudioSource.STDERR_TAIL + 100
+
+
+def test_aclose_reaps_the_process(monkeypatch):
+    fake_ffmpeg(monkeypatch, 3200000)
+
+    async def run():
+        source = await FfmpegAudioSource.start("input.mp3")
+        await source.aclose()
+        return source._process.returncode
+
+    assert asyncio.run(asyncio.wait_for(run(), 10)) is not None
+
+
+def test_wav_with_large_metadata_chunk(tmp_path):
+    wav_path = tmp_path / "list.wav"
+    wav_path.write_bytes(make_wav(bytes(32000), extra_chunks=LIST_CHUNK))
+
+    with WavFileSource(str(wav_path)) as source:
+        assert CommonUtils.read_wav_info(source.header)[:3] == (1, 2, 16000)
+        assert CommonUtils.wav_data_offset(source.header) == len(source.header) == 44 + len(LIST_CHUNK)
+
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrWsClient(server.url, pacing=NO_PACING, reconnect_attempts=1) as client:
+                return [response async for response in client.execute(str(wav_path), finals_only=True)]
+
+    responses = asyncio.run(run())
+    assert len(responses) == 1 and responses[0].is_last_package and responses[0].code == 0
+
+
+def test_normalized_wav_with_large_metadata_chunk(tmp_path):
+    pytest.importorskip("numpy")
+    wav_path = tmp_path / "list_8k.wav"
+    wav_path.write_bytes(make_wav(bytes(16000), sample_rate=8000, extra_chunks=LIST_CHUNK))
+
+    async def run():
+        source = NormalizedWavSource(str(wav_path))
+        try:
+            return sum([len(segment) async for segment, _ in source.asegments(6400)])
+        finally:
+            source.close()
+
+    assert asyncio.run(run()) == 32000
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from helpers import NO_PACING, make_wav, pcm_chunks
+from sauc_mock_server import MockAsrServer, MockServerConfig
+from sauc_websocket_demo import MULAW_8K_MONO, PCM_16K_MONO, AsrWsClient, BytesAudioSource
+
+
+class DropOnceConfig(MockServerConfig):
+    """服务端收到 drop_after 帧后断开一次连接，之后的连接不再断开"""
+
+    def __init__(self, drop_after, **kwargs):
+        super().__init__(**kwargs)
+        self.drop_after = drop_after
+        self.server = None
+
+    @property
+    def drop_rate(self):
+        if self.server.connections_dropped or self.server.frames_received < self.drop_after:
+            return 0.0
+        return 1.0
+
+    @drop_rate.setter
+    def drop_rate(self, value):
+        pass
+
+
+def test_execute_stream_resegments_chunks():
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrWsClient(server.url, pacing=NO_PACING) as client:
+                # 块大小与分段大小（6400 字节）无关
+                return [response async for response in
+                        client.execute_stream(pcm_chunks(48000, 1000), PCM_16K_MONO, finals_only=True)]
+
+    responses = asyncio.run(run())
+    assert len(responses) == 1
+    assert responses[0].payload_msg["audio_info"]["duration"] == 1500
+
+
+def test_execute_stream_decodes_mulaw():
+    pytest.importorskip("numpy")
+
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrWsClient(server.url, pacing=NO_PACING) as client:
+                # 8kHz μ-law 每秒 8000 字节，上采样为 16kHz PCM 后发送
+                return [response async for response in
+                        client.execute_stream(pcm_chunks(16000, 160), MULAW_8K_MONO, finals_only=True)]
+
+    responses = asyncio.run(run())
+    assert responses[-1].payload_msg["audio_info"]["duration"] == 2000
+
+
+def test_reconnect_replays_and_stitches():
+    config = DropOnceConfig(drop_after=25)
+
+    async def run():
+        async with MockAsrServer(config) as server:
+            config.server = server
+            async with AsrWsClient(server.url, pacing=NO_PACING, reconnect_attempts=3) as client:
+                responses = [response async for response in
+                             client.execute(BytesAudioSource(make_wav(bytes(32000 * 8))))]
+                return responses, client._resume, server
+
+    responses, resume, server = asyncio.run(run())
+    assert server.connections_dropped == 1 and server.sessions == 2
+    assert resume.reconnects == 1
+    # 第一句（0-3000ms）断线前已确定，新会话从 3000ms 开始重放
+    assert resume.stitcher.offset_ms == 3000
+    final = responses[-1].payload_msg
+    assert responses[-1].is_last_package
+    assert final["audio_info"]["duration"] == 8000
+    assert [(u["start_time"], u["end_time"]) for u in final["result"]["utterances"]] == \
+        [(0, 3000), (3000, 6000), (6000, 8000)]
+    assert final["result"]["text"] == "".join(u["text"] for u in final["result"]["utterances"])
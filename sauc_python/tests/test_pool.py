@@ -0,0 +1,101 @@
+import asyncio
+
+import sauc_mock_server
+from helpers import NO_PACING, make_wav, pcm_chunks
+from sauc_mock_server import MockAsrServer, parse_client_frame
+from sauc_pool import AsrSessionPool
+from sauc_websocket_demo import PCM_16K_MONO, BytesAudioSource, MessageType
+
+
+async def wait_for_standby(pool, count, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while pool.stats()["standby"] < count:
+        assert loop.time() < deadline, f"standby stuck at {pool.stats()['standby']}, expected {count}"
+        await asyncio.sleep(0.01)
+
+
+def test_standby_session_is_prepared():
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrSessionPool(server.url, max_sessions=4, standby=2, pacing=NO_PACING) as pool:
+                await wait_for_standby(pool, 2)
+                async with pool.session("call-1") as client:
+                    assert client.prepared
+                    responses = [response async for response in
+                                 client.execute(BytesAudioSource(make_wav(bytes(32000))), finals_only=True)]
+                await wait_for_standby(pool, 2)
+                return responses, pool.stats(), server.sessions
+
+    responses, stats, sessions = asyncio.run(run())
+    assert responses[-1].is_last_package
+    assert stats["warm_hits"] == 1 and stats["warm_misses"] == 0
+    # 热备会话直接发送音频，不需要再建连接：2 个初始热备 + 1 个补充
+    assert sessions == 3
+
+
+def test_pool_limits_concurrent_sessions():
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrSessionPool(server.url, max_sessions=1, pacing=NO_PACING) as pool:
+                await pool.acquire("call-1")
+                try:
+                    await pool.acquire("call-2", timeout=0.05)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                else:
+                    timed_out = False
+                await pool.release("call-1")
+                await pool.acquire("call-2", timeout=0.05)
+                return timed_out, pool.stats()
+
+    timed_out, stats = asyncio.run(run())
+    assert timed_out
+    assert stats["active"] == 1 and stats["created"] == 2
+
+
+def test_standby_refills_after_pool_exhausted():
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrSessionPool(server.url, max_sessions=2, standby=1, pacing=NO_PACING) as pool:
+                await wait_for_standby(pool, 1)
+                # 一个取走热备，一个新建，名额用满，补充循环在此期间无法预热
+                await pool.acquire("call-1")
+                await pool.acquire("call-2")
+                await asyncio.sleep(0.05)
+                assert pool.stats()["standby"] == 0
+                await pool.release("call-1")
+                await pool.release("call-2")
+                await wait_for_standby(pool, 1)
+                return pool.stats()
+
+    stats = asyncio.run(run())
+    assert stats["warm_hits"] == 1 and stats["warm_misses"] == 1
+
+
+def test_stream_uses_standby_without_new_handshake(monkeypatch):
+    declared = []
+
+    def recording_parse(data):
+        frame = parse_client_frame(data)
+        if frame[0] == MessageType.CLIENT_FULL_REQUEST:
+            declared.append(frame[3]["audio"]["format"])
+        return frame
+
+    monkeypatch.setattr(sauc_mock_server, "parse_client_frame", recording_parse)
+
+    async def run(standby_format):
+        declared.clear()
+        async with MockAsrServer() as server:
+            pool_options = {} if standby_format is None else {"standby_format": standby_format}
+            async with AsrSessionPool(server.url, standby=1, pacing=NO_PACING, **pool_options) as pool:
+                await wait_for_standby(pool, 1)
+                async with pool.session("call-1") as client:
+                    responses = [response async for response in
+                                 client.execute_stream(pcm_chunks(32000, 6400), PCM_16K_MONO, finals_only=True)]
+                await wait_for_standby(pool, 1)
+                return responses[-1].payload_msg["audio_info"]["duration"], server.sessions, list(declared)
+
+    # 默认按 WAV 预热：16kHz/16bit/单声道 PCM 直接使用热备会话，不重新握手
+    assert asyncio.run(run(None)) == (1000, 2, ["wav", "wav"])
+    assert asyncio.run(run(PCM_16K_MONO)) == (1000, 2, ["pcm", "pcm"])
@@ -0,0 +1,151 @@
+import asyncio
+
+import sauc_mock_server
+from helpers import NO_PACING, make_wav
+from sauc_mock_server import (
+    ERROR_SERVER_BUSY,
+    MockAsrServer,
+    MockServerConfig,
+    build_error_frame,
+    build_server_frame,
+    parse_client_frame,
+)
+from sauc_websocket_demo import (
+    AsrWsClient,
+    AudioFrameEncoder,
+    BytesAudioSource,
+    CodecOffload,
+    CompressionType,
+    MessageType,
+    MessageTypeSpecificFlags,
+    PayloadCompressor,
+    RequestBuilder,
+    ResponseParser,
+    ResponseStreamParser,
+)
+
+def wav_seconds(seconds):
+    return make_wav(bytes(32000 * seconds))
+
+
+def test_full_client_request_round_trip():
+    message_type, flags, seq, payload = parse_client_frame(RequestBuilder.new_full_client_request(1))
+    assert message_type == MessageType.CLIENT_FULL_REQUEST
+    assert flags == MessageTypeSpecificFlags.POS_SEQUENCE
+    assert seq == 1
+    assert payload["audio"] == {"format": "wav", "codec": "raw", "rate": 16000, "bits": 16, "channel": 1}
+
+
+def test_last_audio_packet_has_negative_sequence():
+    segment = bytes(range(256)) * 25
+    for compressor in (PayloadCompressor(), PayloadCompressor("none")):
+        encoder = AudioFrameEncoder(compressor)
+        message_type, flags, seq, payload = parse_client_frame(bytes(encoder.encode(7, segment)))
+        assert (message_type, flags, seq, payload) == (
+            MessageType.CLIENT_AUDIO_ONLY_REQUEST, MessageTypeSpecificFlags.POS_SEQUENCE, 7, segment)
+
+        frame = bytes(encoder.encode(8, segment, is_last=True))
+        assert frame == RequestBuilder.new_audio_only_request(8, segment, True, compressor)
+        _, flags, seq, payload = parse_client_frame(frame)
+        assert (flags, seq, payload) == (MessageTypeSpecificFlags.NEG_WITH_SEQUENCE, -8, segment)
+
+
+def test_offloaded_encode_matches_encode():
+    segment = bytes(range(256)) * 25
+    offload = CodecOffload(threshold=0, max_workers=1)
+    encoder = AudioFrameEncoder(PayloadCompressor())
+
+    async def run():
+        return [bytes(await encoder.encode_offloaded(9, segment, is_last, offload)) for is_last in (False, True)]
+
+    try:
+        offloaded = asyncio.run(run())
+    finally:
+        offload.shutdown()
+    assert offload.offloaded == 2
+    assert offloaded == [bytes(encoder.encode(9, segment, is_last)) for is_last in (False, True)]
+
+
+def test_parse_server_frames():
+    result = {"result": {"text": "您好"}}
+    response = ResponseParser.parse_response(build_server_frame(-3, result, is_last=True))
+    assert (response.code, response.payload_sequence, response.is_last_package) == (0, -3, True)
+    assert response.payload_msg == result
+
+    plain = ResponseParser.parse_response(build_server_frame(2, result, compression=CompressionType.NO_COMPRESSION))
+    assert not plain.is_last_package and plain.payload_msg == result
+
+    error = ResponseParser.parse_response(build_error_frame(ERROR_SERVER_BUSY, "busy"))
+    assert error.code == ERROR_SERVER_BUSY
+    assert error.payload_msg == {"error": "busy"}
+
+
+def test_stream_parser_handles_split_and_joined_frames():
+    frames = [build_server_frame(seq, {"seq": seq}) for seq in range(1, 4)]
+    data = b''.join(frames)
+    parser = ResponseStreamParser()
+    responses = parser.feed(data[:len(frames[0]) + 5])
+    assert [r.payload_msg for r in responses] == [{"seq": 1}]
+    assert parser.pending == 5
+    responses = parser.feed(data[len(frames[0]) + 5:])
+    assert [r.payload_msg for r in responses] == [{"seq": 2}, {"seq": 3}]
+    assert parser.pending == 0
+
+
+def test_session_against_mock_server(monkeypatch):
+    received = []
+
+    def recording_parse(data):
+        frame = parse_client_frame(data)
+        received.append(frame[:3])
+        return frame
+
+    monkeypatch.setattr(sauc_mock_server, "parse_client_frame", recording_parse)
+
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrWsClient(server.url, pacing=NO_PACING) as client:
+                return [response async for response in client.execute(BytesAudioSource(wav_seconds(1)))]
+
+    responses = asyncio.run(run())
+    # 完整请求 + 6 个音频包（WAV 头随第一包发出，多出的 44 字节单独成一包），最后一包序号为负
+    assert [frame[0] for frame in received] == [MessageType.CLIENT_FULL_REQUEST] + \
+        [MessageType.CLIENT_AUDIO_ONLY_REQUEST] * 6
+    assert [frame[2] for frame in received] == [1, 2, 3, 4, 5, 6, -7]
+    assert received[-1][1] == MessageTypeSpecificFlags.NEG_WITH_SEQUENCE
+    assert responses[-1].is_last_package
+    assert responses[-1].payload_msg["audio_info"]["duration"] == 1001  # 模拟服务把 WAV 头也算作音频
+    assert all(not response.is_last_package for response in responses[:-1])
+
+
+def test_error_frame_ends_session():
+    async def run():
+        async with MockAsrServer(MockServerConfig(error_rate=1.0)) as server:
+            async with AsrWsClient(server.url, pacing=NO_PACING) as client:
+                responses = [response async for response in client.execute(BytesAudioSource(wav_seconds(1)))]
+            return responses, server.errors_injected
+
+    responses, errors = asyncio.run(run())
+    assert errors == 1
+    assert responses[-1].code == ERROR_SERVER_BUSY
+    assert responses[-1].payload_msg == {"error": "injected error"}
+
+
+def test_finals_only_skips_partials():
+    async def run():
+        async with MockAsrServer() as server:
+            async with AsrWsClient(server.url, pacing=NO_PACING) as client:
+                return [response async for response in
+                        client.execute(BytesAudioSource(wav_seconds(2)), finals_only=True)]
+
+    responses = asyncio.run(run())
+    assert len(responses) == 1 and responses[0].is_last_package
+    assert responses[0].payload_msg["audio_info"]["duration"] == 2001
+
+
+def test_unknown_message_type_is_skipped():
+    frame = bytearray(build_server_frame(4, {"result": {}}))
+    frame[1] = (0b1011 << 4) | MessageTypeSpecificFlags.POS_SEQUENCE
+    response = ResponseParser.parse_response(bytes(frame))
+    assert (response.code, response.payload_sequence, response.payload_msg) == (0, 4, None)
+    assert not response.is_last_package
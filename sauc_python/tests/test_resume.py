@@ -0,0 +1,48 @@
+from sauc_resume import ReplayBuffer, TranscriptStitcher
+
+
+def result(utterances, duration):
+    return {
+        "audio_info": {"duration": duration},
+        "result": {"text": "".join(u["text"] for u in utterances), "utterances": utterances},
+    }
+
+
+def test_replay_buffer_keeps_latest_bytes():
+    buffer = ReplayBuffer(8)
+    buffer.append(b"0123")
+    buffer.append(b"456789ab")
+    assert (buffer.start, buffer.end) == (4, 12)
+    assert buffer.read_from(0) == b"456789ab"
+    assert buffer.read_from(10) == b"ab"
+
+
+def test_stitch_shares_carried_prefix():
+    stitcher = TranscriptStitcher()
+    first = {"definite": True, "start_time": 0, "end_time": 3000, "text": "您好",
+             "words": [{"start_time": 0, "end_time": 500, "text": "您"}]}
+    stitcher.observe(result([first], 3500))
+    stitcher.resume(3000)
+
+    responses = [
+        stitcher.stitch(result([{"definite": False, "start_time": 0, "end_time": duration, "text": "请问"}], duration))
+        for duration in (400, 800)
+    ]
+    for response, duration in zip(responses, (400, 800)):
+        assert response["audio_info"]["duration"] == 3000 + duration
+        assert response["result"]["text"] == "您好请问"
+        assert [(u["start_time"], u["end_time"]) for u in response["result"]["utterances"]] == \
+            [(0, 3000), (3000, 3000 + duration)]
+    # 之前会话的句子只在续传时拷贝一次，各条响应共用同一份
+    assert responses[0]["result"]["utterances"][0] is responses[1]["result"]["utterances"][0]
+    assert stitcher.committed[0] is not stitcher.carried[0]
+    assert stitcher.committed == [first]
+
+
+def test_tentative_before_offset_is_committed_on_resume():
+    stitcher = TranscriptStitcher()
+    stitcher.observe(result([{"definite": False, "start_time": 0, "end_time": 1000, "text": "喂"},
+                             {"definite": False, "start_time": 1000, "end_time": 2000, "text": "您好"}], 2000))
+    stitcher.resume(1000)
+    assert [u["text"] for u in stitcher.carried] == ["喂"]
+    assert stitcher.carried[0]["definite"]
@@ -0,0 +1,38 @@
+import asyncio
+import math
+import time
+
+from sauc_scheduler import TickScheduler
+
+
+def test_waiters_in_one_tick_wake_together():
+    async def run():
+        scheduler = TickScheduler(tick_ms=20)
+        loop = asyncio.get_running_loop()
+        boundary = (math.ceil(loop.time() / scheduler.tick) + 2) * scheduler.tick
+        # 截止时间不同但落在同一个节拍内
+        await asyncio.gather(*(scheduler.sleep_until(boundary - i * 0.002) for i in range(5)))
+        return scheduler.snapshot(), loop.time() - boundary
+
+    snapshot, late_by = asyncio.run(run())
+    assert snapshot["ticks"] == 1 and snapshot["wakeups"] == 5
+    assert late_by >= 0
+
+
+def test_late_loop_does_not_drop_parked_waiters():
+    async def run():
+        scheduler = TickScheduler(tick_ms=20, slots=4)
+        loop = asyncio.get_running_loop()
+        first = (math.ceil(loop.time() / scheduler.tick) + 2) * scheduler.tick
+        parked = asyncio.create_task(scheduler.sleep_until(first))
+        await asyncio.sleep(0)
+
+        async def late():
+            # 事件循环卡住，first 所在节拍到期但还没有触发；
+            # 此时一个整圈之后的截止时间落在同一个槽位上
+            time.sleep(0.1)
+            await scheduler.sleep_until(first + scheduler.slots * scheduler.tick)
+
+        await asyncio.wait_for(asyncio.gather(parked, late()), 1.0)
+
+    asyncio.run(run())
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+
+import sauc_mock_server
+from helpers import NO_PACING, make_wav
+from sauc_mock_server import MockAsrServer, parse_client_frame
+from sauc_websocket_demo import AsrWsClient, BytesAudioSource, MessageType, SendQueue, SendQueuePolicy
+
+
+class SlowSendClient(AsrWsClient):
+    """每发送一包前暂停，模拟网络慢于读取音频；fail_after 包之后发送失败"""
+
+    def __init__(self, *args, send_delay=0.005, fail_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.send_delay = send_delay
+        self.fail_after = fail_after
+        self.sends = 0
+
+    async def _send_audio(self, packet, is_last):
+        await asyncio.sleep(self.send_delay)
+        if self.fail_after is not None and self.sends >= self.fail_after:
+            raise ConnectionResetError("send failed")
+        self.sends += 1
+        await super()._send_audio(packet, is_last)
+
+
+def record_audio_frames(monkeypatch):
+    received = []
+
+    def recording_parse(data):
+        frame = parse_client_frame(data)
+        if frame[0] == MessageType.CLIENT_AUDIO_ONLY_REQUEST:
+            received.append((frame[2], frame[3]))
+        return frame
+
+    monkeypatch.setattr(sauc_mock_server, "parse_client_frame", recording_parse)
+    return received
+
+
+def test_policy_spec():
+    assert repr(SendQueuePolicy.from_spec("coalesce:16:5")) == \
+        "SendQueuePolicy(coalesce, max_pending=16, max_coalesce=5)"
+    assert SendQueuePolicy.from_spec("coalesce:2").max_coalesce == 2
+    assert SendQueuePolicy.from_spec("drop").max_pending == 16
+    for spec in ("coalesce:2:4", "block:0", "fifo:4", "drop:4:2"):
+        with pytest.raises(ValueError):
+            SendQueuePolicy.from_spec(spec)
+
+
+def test_block_stalls_the_producer():
+    async def run():
+        queue = SendQueue(SendQueuePolicy(SendQueuePolicy.BLOCK, 2))
+        assert await queue.put(b'a', False) and await queue.put(b'b', False)
+        producer = asyncio.create_task(queue.put(b'c', False))
+        await asyncio.sleep(0.02)
+        assert not producer.done() and queue.depth == 2
+        assert await queue.get() == (b'a', False)
+        assert await asyncio.wait_for(producer, 1)
+        return [await queue.get(), await queue.get()], queue.blocked_seconds
+
+    items, blocked = asyncio.run(run())
+    assert items == [(b'b', False), (b'c', False)]
+    assert blocked >= 0.01
+
+
+def test_coalesce_merges_queued_segments():
+    async def run():
+        queue = SendQueue(SendQueuePolicy(SendQueuePolicy.COALESCE, 4, 3))
+        for packet, is_last in ((b'a', False), (b'b', False), (b'c', False), (b'd', False)):
+            await queue.put(packet, is_last)
+        first = await queue.get()
+        await queue.put(b'e', True)
+        return [first, await queue.get()], queue.coalesced_segments
+
+    # 一帧最多合并 max_coalesce 段；最后一包合并进前面的分段后整帧仍带最后一包标记
+    assert asyncio.run(run()) == ([(b'abc', False), (b'de', True)], 3)
+
+
+def test_coalesce_session_keeps_sequence_and_last_flag(monkeypatch):
+    received = record_audio_frames(monkeypatch)
+    wav = make_wav(bytes(32000 * 4))
+
+    async def run():
+        async with MockAsrServer() as server:
+            async with SlowSendClient(server.url, pacing=NO_PACING,
+                                      send_queue=SendQueuePolicy.from_spec("coalesce:8:4")) as client:
+                responses = [response async for response in client.execute(BytesAudioSource(wav))]
+                return responses, client.send_queue_state
+
+    responses, queue = asyncio.run(run())
+    seqs = [seq for seq, _ in received]
+    # 序号从完整请求之后连续编号，合并不会跳号；只有最后一帧为负
+    assert seqs == list(range(2, len(seqs) + 1)) + [-(len(seqs) + 1)]
+    assert b''.join(payload for _, payload in received) == wav
+    assert queue.coalesced_segments > 0
+    assert len(received) + queue.coalesced_segments == -(-len(wav) // 6400)
+    assert responses[-1].is_last_package and responses[-1].code == 0
+
+
+def test_drop_counts_segments_but_keeps_last_packet():
+    async def run():
+        queue = SendQueue(SendQueuePolicy(SendQueuePolicy.DROP, 2))
+        results = [await queue.put(packet, False) for packet in (b'a', b'b', b'cc', b'dd')]
+        last = asyncio.create_task(queue.put(b'e', True))
+        await asyncio.sleep(0.02)
+        assert not last.done()
+        items = [await queue.get()]
+        results.append(await asyncio.wait_for(last, 1))
+        items += [await queue.get(), await queue.get()]
+        return results, items, queue.snapshot()
+
+    results, items, snapshot = asyncio.run(run())
+    assert results == [True, True, False, False, True]
+    assert items == [(b'a', False), (b'b', False), (b'e', True)]
+    assert (snapshot["dropped_segments"], snapshot["dropped_bytes"]) == (2, 4)
+
+
+def test_fail_wakes_blocked_put():
+    async def run():
+        queue = SendQueue(SendQueuePolicy(SendQueuePolicy.BLOCK, 1))
+        await queue.put(b'a', False)
+        producer = asyncio.create_task(queue.put(b'b', False))
+        await asyncio.sleep(0.01)
+        queue.fail(ConnectionResetError("send failed"))
+        await asyncio.wait_for(producer, 1)
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(run())
+
+
+def test_writer_failure_reaches_session():
+    async def run():
+        async with MockAsrServer() as server:
+            async with SlowSendClient(server.url, pacing=NO_PACING, fail_after=2,
+                                      send_queue=SendQueuePolicy.from_spec("block:2")) as client:
+                return [response async for response in client.execute(BytesAudioSource(make_wav(bytes(32000 * 4))))]
+
+    started = time.monotonic()
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(asyncio.wait_for(run(), 5))
+    # 发送失败要结束会话，而不是让接收一直等到超时
+    assert time.monotonic() - started < 2
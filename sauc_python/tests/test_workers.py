@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+from helpers import NO_PACING, make_wav, pcm_chunks
+from sauc_mock_server import MockAsrServer
+from sauc_shm import SharedAudioRing
+from sauc_workers import ConsistentHashRing, ShardedAsrSupervisor
+
+
+def test_hash_ring_is_stable():
+    ring = ConsistentHashRing(4)
+    assert [ring.node_for(f"call-{i}") for i in range(100)] == \
+        [ConsistentHashRing(4).node_for(f"call-{i}") for i in range(100)]
+    # 增加一个进程时，大部分通话仍留在原进程
+    grown = ConsistentHashRing(5)
+    moved = sum(ring.node_for(f"call-{i}") != grown.node_for(f"call-{i}") for i in range(1000))
+    assert moved < 400
+
+
+def test_worker_pool_file_and_streams(tmp_path):
+    wav_path = tmp_path / "call.wav"
+    wav_path.write_bytes(make_wav(bytes(32000)))
+
+    async def finals(responses):
+        return [response["payload_msg"] async for response in responses if response["is_last_package"]]
+
+    async def run():
+        async with MockAsrServer() as server:
+            results = {}
+            for shared_memory in (False, True):
+                async with ShardedAsrSupervisor(server.url, workers=2, with_metrics=True,
+                                                shared_memory=shared_memory, pacing=NO_PACING) as supervisor:
+                    results[shared_memory] = await asyncio.gather(
+                        finals(supervisor.transcribe("call-file", str(wav_path), finals_only=True)),
+                        finals(supervisor.transcribe_stream("call-a", pcm_chunks(48000, 1000), finals_only=True)),
+                        finals(supervisor.transcribe_stream("call-b", pcm_chunks(64000, 7000), finals_only=True)),
+                    )
+                    metrics = (await supervisor.metrics()).snapshot()
+                    assert supervisor.stats()["active_calls"] == [0, 0]
+            return results, metrics
+
+    results, metrics = asyncio.run(run())
+    for by_file, stream_a, stream_b in results.values():
+        assert by_file[0]["audio_info"]["duration"] == 1001  # WAV 头也算作音频
+        assert stream_a[0]["audio_info"]["duration"] == 1500
+        assert stream_b[0]["audio_info"]["duration"] == 2000
+    # 延迟统计从两个工作进程汇总：每轮 3 个通话
+    assert metrics["sessions"] == 3
+
+
+async def failing_chunks():
+    yield bytes(6400)
+    await asyncio.sleep(0)
+    raise OSError("gateway stream reset")
+
+
+@pytest.mark.parametrize("shared_memory", [False, True])
+def test_failing_source_fails_the_call(shared_memory):
+    async def run():
+        async with MockAsrServer() as server:
+            async with ShardedAsrSupervisor(server.url, workers=1, shared_memory=shared_memory,
+                                            pacing=NO_PACING) as supervisor:
+                with pytest.raises(OSError, match="gateway stream reset"):
+                    async for _ in supervisor.transcribe_stream("call-broken", failing_chunks()):
+                        pass
+                # 工作进程已结束该通话，同一进程继续处理后续通话，退出时也不会卡住
+                responses = [response async for response in
+                             supervisor.transcribe_stream("call-next", pcm_chunks(6400, 6400), finals_only=True)]
+                assert responses[-1]["payload_msg"]["audio_info"]["duration"] == 200
+
+    asyncio.run(asyncio.wait_for(run(), 30))
+
+
+def test_chunks_larger_than_the_ring():
+    async def run():
+        async with MockAsrServer() as server:
+            async with ShardedAsrSupervisor(server.url, workers=1, shared_memory=True, ring_slots=4,
+                                            pacing=NO_PACING) as supervisor:
+                # 一块 2 秒音频，是 4 个 200ms 槽位的 2.5 倍
+                return [response async for response in
+                        supervisor.transcribe_stream("call-big", pcm_chunks(64000, 64000), finals_only=True)]
+
+    responses = asyncio.run(asyncio.wait_for(run(), 30))
+    assert responses[-1]["payload_msg"]["audio_info"]["duration"] == 2000
+
+
+@pytest.mark.parametrize("with_lock", [False, True])
+def test_ring_awrite_waits_for_reader(with_lock):
+    lock = multiprocessing.Lock() if with_lock else None
+
+    async def run():
+        with SharedAudioRing.create(4, slots=2, lock=lock, poll_interval=0.001) as writer:
+            reader = SharedAudioRing.attach(writer.name, lock)
+            # 轮询间隔由创建方写入头部
+            assert reader.poll_interval == pytest.approx(0.001)
+            received = bytearray()
+
+            async def read():
+                async for chunk in reader.chunks():
+                    received.extend(chunk)
+
+            task = asyncio.create_task(read())
+            data = bytes(range(30))
+            await writer.awrite(data[:3])
+            await writer.awrite(data[3:])  # 比整个缓冲区（8 字节）大，边等边写
+            writer.close_writer()
+            await task
+            reader.close()
+            return received, data, writer.overruns
+
+    received, data, overruns = asyncio.run(asyncio.wait_for(run(), 10))
+    assert received == data and overruns == 0